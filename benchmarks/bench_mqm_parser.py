@@ -0,0 +1,122 @@
+"""Micro-benchmark of the GEMBA-MQM answer parsers.
+
+Checks that parse_mqm gives exactly what parse_mqm_answer gives on the fixture
+answers in benchmarks/fixtures/mqm_answers.jsonl and on a synthetic corpus
+built from their lines, then times both:
+
+    python benchmarks/bench_mqm_parser.py --answers 20000 --repeat 5
+
+The original parser is timed the way the evaluator used it, called once for
+the errors and once for the score, and also as a single call for the errors
+alone, which is what callers that only list errors pay. The run fails if any
+answer parses differently.
+"""
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent.absolute()
+GEMBA_DIR = ROOT / "gemba_evaluators copy"
+FIXTURES = Path(__file__).parent / "fixtures" / "mqm_answers.jsonl"
+
+sys.path.insert(0, str(GEMBA_DIR))
+from gemba_mqm import parse_mqm, parse_mqm_answer
+
+HEADERS = ("Critical:", "Major:", "Minor:")
+
+def load_fixtures(path=FIXTURES):
+    with open(path, 'r', encoding='utf-8') as fixtures_file:
+        return [json.loads(line)["answer"] for line in fixtures_file if line.strip()]
+
+def synthetic_answers(fixtures, count, seed):
+    """Judge answers assembled from random headers and error lines of the fixtures."""
+    rng = random.Random(seed)
+    lines = [
+        line for answer in fixtures if not answer.startswith("{")
+        for line in answer.split("\n") if line.strip() and line.strip() not in HEADERS
+    ]
+    json_answers = [answer for answer in fixtures if answer.startswith("{")]
+    answers = []
+    for _ in range(count):
+        if rng.random() < 0.02:
+            answers.append(rng.choice(json_answers))
+            continue
+        parts = []
+        for header in rng.sample(HEADERS, 3):
+            parts.append(header)
+            parts += rng.choices(lines, k=rng.choice((0, 0, 1, 1, 2, 3, 8)))
+        answers.append("\n".join(parts) + "\n")
+    return answers
+
+def original(answer, classify=False):
+    return parse_mqm_answer(answer, list_mqm_errors=True, full_desc=not classify), parse_mqm_answer(answer)
+
+def original_errors(answer, classify=False):
+    return parse_mqm_answer(answer, list_mqm_errors=True, full_desc=not classify)
+
+def mismatches(answers):
+    """Answers for which the two parsers disagree, in value or in key order."""
+    different = []
+    for answer in answers:
+        for classify in (False, True):
+            expected, actual = original(answer, classify), parse_mqm(answer, classify)
+            if expected != actual or json.dumps(expected) != json.dumps(actual):
+                different.append({"answer": answer, "classify": classify, "expected": expected, "actual": actual})
+    return different
+
+def best_time(function, answers, repeat):
+    """Best wall time of parsing every answer, over repeat runs."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for answer in answers:
+            function(answer)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the GEMBA-MQM answer parsers")
+    parser.add_argument("--answers", type=int, default=20000, help="Synthetic answers to parse (default: 20000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per parser; the best is kept (default: 5)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus (default: 0)")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    answers = synthetic_answers(fixtures, args.answers, args.seed)
+    # parse_mqm_answer prints suspicious lines to stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        different = mismatches(fixtures + answers)
+    if different:
+        for case in different[:5]:
+            print(json.dumps(case, ensure_ascii=False, default=str))
+        print(f"{len(different)} answers parse differently")
+        sys.exit(1)
+    print(f"{len(fixtures)} fixture and {len(answers)} synthetic answers parse identically")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        groups = [
+            [
+                ("parse_mqm_answer x2", best_time(original, answers, args.repeat)),
+                ("parse_mqm_answer x1", best_time(original_errors, answers, args.repeat)),
+                ("parse_mqm", best_time(parse_mqm, answers, args.repeat)),
+            ],
+            [
+                ("parse_mqm_answer x2 (classes)", best_time(lambda answer: original(answer, True), answers, args.repeat)),
+                ("parse_mqm_answer x1 (classes)", best_time(lambda answer: original_errors(answer, True), answers, args.repeat)),
+                ("parse_mqm (classes)", best_time(lambda answer: parse_mqm(answer, True), answers, args.repeat)),
+            ],
+        ]
+    # Speedups of parse_mqm against two calls, as the evaluator made them, and against one
+    print(f"{'':<32}{'us/answer':>10}{'vs x2':>8}{'vs x1':>8}")
+    for cases in groups:
+        twice, once = cases[0][1], cases[1][1]
+        for name, seconds in cases:
+            print(f"{name:<32}{seconds / len(answers) * 1e6:>10.2f}{twice / seconds:>7.2f}x{once / seconds:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
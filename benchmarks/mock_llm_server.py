@@ -0,0 +1,591 @@
+"""A local stand-in for the Anthropic, OpenAI and Gemini APIs.
+
+Serves the messages, chat completions, generateContent, Message Batches,
+Batch and Files endpoints used by the translator, the web app and the GEMBA
+evaluator, so batch and interactive runs can be exercised and benchmarked
+without API keys or cost:
+
+    python benchmarks/mock_llm_server.py --port 8765
+    export ANTHROPIC_BASE_URL=http://127.0.0.1:8765
+    export OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+    export GEMINI_BASE_URL=http://127.0.0.1:8765
+    python "translator_scripts copy/translate.py" --provider claude --batch --poll-interval 1
+
+Replies are deterministic: translations echo the start of the source text,
+and GEMBA-MQM prompts get an answer with no errors. Prompt caching is
+simulated: a prefix marked with cache_control (Anthropic), or every message
+but the last (OpenAI), is reported as a cache write the first time it is seen
+and as a cache read afterwards.
+
+Interactive requests can be given a latency distribution, a generation speed
+and a share of 429 and 5xx failures (see Behavior); batches are unaffected.
+"""
+import re
+import math
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MQM_REPLY = "Critical:\nno-error\nMajor:\nno-error\nMinor:\nno-error\n"
+
+# Characters of the source echoed back as its "translation"
+ECHO_CHARACTERS = 80
+
+_seen_prefixes = set()
+_seen_prefixes_lock = threading.Lock()
+
+def cached_prefix_tokens(prefix):
+    """Return (tokens read, tokens written) for a cacheable prompt prefix."""
+    if not prefix:
+        return 0, 0
+    tokens = len(prefix) // 4
+    with _seen_prefixes_lock:
+        if prefix in _seen_prefixes:
+            return tokens, 0
+        _seen_prefixes.add(prefix)
+    return 0, tokens
+
+class Behavior:
+    """Latency, generation speed and injected failures of interactive requests.
+
+    Latency is drawn from a log-normal distribution with the given median and
+    sigma (sigma 0 makes it constant) and is spent before the first token.
+    The reply is then generated at tokens_per_second, spread over the stream
+    events. A rate_limit_rate share of requests fails with a 429 and
+    retry-after, and a server_error_rate share with a 500 or 503.
+
+    Every draw comes from a generator seeded with the seed, the request body and
+    the number of times that body has been seen, so a run replays the same
+    latencies and failures whatever order its requests arrive in, while a
+    retried request gets a fresh draw.
+    """
+
+    def __init__(self, latency=0.0, latency_sigma=0.0, tokens_per_second=0.0, rate_limit_rate=0.0,
+                 server_error_rate=0.0, retry_after=1.0, echo_characters=ECHO_CHARACTERS, seed=0):
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self.echo_characters = echo_characters
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the requests seen so far, so the next run replays the same draws."""
+        with self._lock:
+            self._attempts = Counter()
+            self.stats = Counter()
+
+    def plan(self, body):
+        """Return (error status or None, seconds before the first token) for a request body."""
+        key = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            attempt = self._attempts[key]
+            self._attempts[key] += 1
+            self.stats["requests"] += 1
+            if attempt:
+                self.stats["repeated_requests"] += 1
+        rng = random.Random(f"{self.seed}:{key}:{attempt}")
+        latency = self.latency * math.exp(rng.gauss(0, self.latency_sigma)) if self.latency else 0.0
+        draw = rng.random()
+        status = None
+        if draw < self.rate_limit_rate:
+            status = 429
+        elif draw < self.rate_limit_rate + self.server_error_rate:
+            status = rng.choice((500, 503))
+        with self._lock:
+            self.stats[f"status_{status or 200}"] += 1
+        return status, latency
+
+    def generation_time(self, output_tokens):
+        return output_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+def reply_for(messages, system="", echo_characters=ECHO_CHARACTERS):
+    """Return a deterministic answer for a conversation."""
+    def content_of(message):
+        content = message.get("content", "")
+        if isinstance(content, list):
+            return "".join(block.get("text", "") for block in content)
+        return content
+
+    if any("Critical:" in content_of(message) for message in messages):
+        return MQM_REPLY
+    source = content_of(messages[-1]).split("\n\n")[-1]
+    return f"Translation of: {source[:echo_characters]}"
+
+def anthropic_message(body, echo_characters=ECHO_CHARACTERS):
+    system = body.get("system", "")
+    text = reply_for(body["messages"], system, echo_characters)
+    cacheable = ""
+    if isinstance(system, list):
+        cacheable = json.dumps([block for block in system if block.get("cache_control")])
+    cache_read, cache_write = cached_prefix_tokens(cacheable if cacheable != "[]" else "")
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": body["model"],
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": len(json.dumps(body["messages"])) // 4,
+            "output_tokens": len(text) // 4,
+            "cache_read_input_tokens": cache_read,
+            "cache_creation_input_tokens": cache_write
+        }
+    }
+
+def openai_completion(body, echo_characters=ECHO_CHARACTERS):
+    text = reply_for(body["messages"], echo_characters=echo_characters)
+    cache_read, _ = cached_prefix_tokens(json.dumps(body["messages"][:-1]))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body["model"],
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": len(json.dumps(body["messages"])) // 4,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": (len(json.dumps(body["messages"])) + len(text)) // 4,
+            "prompt_tokens_details": {"cached_tokens": cache_read}
+        }
+    }
+
+def gemini_response(body, model, echo_characters=ECHO_CHARACTERS):
+    messages = [
+        {"content": "".join(part.get("text", "") for part in content.get("parts", []))}
+        for content in body.get("contents", [])
+    ]
+    text = reply_for(messages, echo_characters=echo_characters)
+    prompt_tokens = len(json.dumps(body.get("contents", []))) // 4
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0
+        }],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": prompt_tokens + len(text) // 4,
+            "cachedContentTokenCount": 0
+        },
+        "modelVersion": model
+    }
+
+# Error bodies in each API's shape, by status
+ANTHROPIC_ERRORS = {429: "rate_limit_error", 500: "api_error", 503: "overloaded_error"}
+OPENAI_ERRORS = {429: "rate_limit_exceeded", 500: "server_error", 503: "server_error"}
+GEMINI_ERRORS = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+class MockState:
+    """Batches and files held in memory for the lifetime of the server."""
+
+    def __init__(self, batch_delay, behavior=None):
+        self.batch_delay = batch_delay
+        self.behavior = behavior or Behavior()
+        self.lock = threading.Lock()
+        self.message_batches = {}
+        self.batches = {}
+        self.files = {}
+
+    def finished(self, created):
+        return time.time() - created >= self.batch_delay
+
+class MockHandler(BaseHTTPRequestHandler):
+    state = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_text(self, text, content_type="application/jsonl"):
+        data = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_events(self, events, named=True, output_tokens=0, done=True):
+        """Stream server-sent events, spreading the generation time of output_tokens over them."""
+        lines = []
+        for event in events:
+            if named:
+                lines.append(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n")
+            else:
+                lines.append(f"data: {json.dumps(event)}\n\n")
+        if not named and done:
+            lines.append("data: [DONE]\n\n")
+        self.send_stream(lines, "text/event-stream", output_tokens)
+
+    def send_stream(self, pieces, content_type, output_tokens=0):
+        """Send pieces of a response body as they are "generated", with chunked encoding."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pause = self.state.behavior.generation_time(output_tokens) / len(pieces)
+        for piece in pieces:
+            data = piece.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+            if pause:
+                time.sleep(pause)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def inject(self, raw_body, errors, shape):
+        """Apply the configured behavior; returns True if an error response was sent instead."""
+        status, latency = self.state.behavior.plan(raw_body)
+        if status is None:
+            if latency:
+                time.sleep(latency)
+            return False
+        message = f"Injected {status} from the mock server"
+        if shape == "anthropic":
+            payload = {"type": "error", "error": {"type": errors[status], "message": message}}
+        elif shape == "openai":
+            payload = {"error": {"message": message, "type": errors[status], "param": None, "code": None}}
+        else:
+            payload = {"error": {"code": status, "message": message, "status": errors[status]}}
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("retry-after", str(self.state.behavior.retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+        return True
+
+    def send_generated(self, payload, output_tokens):
+        """Send a non-streaming reply after its generation time."""
+        generation_time = self.state.behavior.generation_time(output_tokens)
+        if generation_time:
+            time.sleep(generation_time)
+        self.send_json(payload)
+
+    def not_found(self):
+        self.send_json({"error": {"type": "not_found_error", "message": self.path}}, status=404)
+
+    # Anthropic
+
+    def anthropic_stream(self, body):
+        message = anthropic_message(body, self.state.behavior.echo_characters)
+        text = message["content"][0]["text"]
+        start = dict(message, content=[], stop_reason=None)
+        events = [
+            {"type": "message_start", "message": start},
+            {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+        ]
+        for i in range(0, len(text), 16):
+            events.append({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text[i:i + 16]}})
+        events += [
+            {"type": "content_block_stop", "index": 0},
+            {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+             "usage": {"output_tokens": message["usage"]["output_tokens"]}},
+            {"type": "message_stop"}
+        ]
+        self.send_events(events, output_tokens=message["usage"]["output_tokens"])
+
+    def message_batch(self, batch_id):
+        batch = self.state.message_batches[batch_id]
+        ended = self.state.finished(batch["created"])
+        count = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else count,
+                "succeeded": count if ended else 0,
+                "errored": 0, "canceled": 0, "expired": 0
+            },
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(batch["created"])),
+            "expires_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(batch["created"] + 86400)),
+            "ended_at": time.strftime("%Y-%m-%dT%H:%M:%SZ") if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"http://{self.headers['Host']}/v1/messages/batches/{batch_id}/results" if ended else None
+        }
+
+    def message_batch_results(self, batch_id):
+        lines = [
+            json.dumps({
+                "custom_id": request["custom_id"],
+                "result": {"type": "succeeded", "message": anthropic_message(request["params"])}
+            })
+            for request in self.state.message_batches[batch_id]["requests"]
+        ]
+        self.send_text("\n".join(lines) + "\n")
+
+    # OpenAI
+
+    def openai_stream(self, body):
+        completion = openai_completion(body, self.state.behavior.echo_characters)
+        text = completion["choices"][0]["message"]["content"]
+        base = {key: completion[key] for key in ("id", "created", "model")}
+        events = [
+            dict(base, object="chat.completion.chunk",
+                 choices=[{"index": 0, "delta": {"content": text[i:i + 16]}, "finish_reason": None}])
+            for i in range(0, len(text), 16)
+        ]
+        events.append(dict(base, object="chat.completion.chunk",
+                           choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            events.append(dict(base, object="chat.completion.chunk", choices=[], usage=completion["usage"]))
+        self.send_events(events, named=False, output_tokens=completion["usage"]["completion_tokens"])
+
+    # Gemini
+
+    def gemini_generate(self, body, model, stream, sse):
+        response = gemini_response(body, model, self.state.behavior.echo_characters)
+        output_tokens = response["usageMetadata"]["candidatesTokenCount"]
+        if not stream:
+            self.send_generated(response, output_tokens)
+            return
+        text = response["candidates"][0]["content"]["parts"][0]["text"]
+        pieces = [text[i:i + 16] for i in range(0, len(text), 16)] or [""]
+        events = [
+            {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0}],
+             "modelVersion": model}
+            for piece in pieces
+        ]
+        # The last event carries the finish reason and usage
+        events[-1] = dict(response, candidates=[dict(response["candidates"][0], content={"parts": [{"text": pieces[-1]}], "role": "model"})])
+        if sse:
+            self.send_events(events, named=False, output_tokens=output_tokens, done=False)
+        else:
+            # Without alt=sse the stream is one JSON array, sent element by element
+            elements = [("[" if i == 0 else ",\r\n") + json.dumps(event) for i, event in enumerate(events)]
+            self.send_stream(elements + ["]"], "application/json", output_tokens)
+
+    def create_file(self):
+        body = self.read_body()
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body
+        )
+        content, filename = b"", "upload"
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "file":
+                content = part.get_payload(decode=True)
+                filename = part.get_filename() or filename
+        return self.store_file(content, filename, "batch")
+
+    def store_file(self, content, filename, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        record = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed"
+        }
+        with self.state.lock:
+            self.state.files[file_id] = (record, content)
+        return record
+
+    def openai_batch(self, batch_id):
+        batch = self.state.batches[batch_id]
+        if self.state.finished(batch["created"]) and batch["output_file_id"] is None:
+            # Run the batch on first read after the delay has passed
+            _, content = self.state.files[batch["input_file_id"]]
+            outputs = []
+            for line in content.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                outputs.append(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex[:16]}",
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": openai_completion(request["body"])},
+                    "error": None
+                }))
+            output = self.store_file(("\n".join(outputs) + "\n").encode("utf-8"), "batch_output.jsonl", "batch_output")
+            batch.update(status="completed", output_file_id=output["id"], completed=len(outputs))
+        return {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": batch["endpoint"],
+            "errors": None,
+            "input_file_id": batch["input_file_id"],
+            "completion_window": "24h",
+            "status": batch["status"],
+            "output_file_id": batch["output_file_id"],
+            "error_file_id": None,
+            "created_at": int(batch["created"]),
+            "request_counts": {"total": batch["total"], "completed": batch["completed"], "failed": 0}
+        }
+
+    # Routing
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path == "/v1/files":
+            self.send_json(self.create_file())
+            return
+
+        raw_body = self.read_body()
+        body = json.loads(raw_body or b"{}")
+        echo = self.state.behavior.echo_characters
+        gemini = re.fullmatch(r"/v1beta/models/([\w.-]+):(generateContent|streamGenerateContent)", path)
+        if path == "/v1/messages":
+            if self.inject(raw_body, ANTHROPIC_ERRORS, "anthropic"):
+                return
+            if body.get("stream"):
+                self.anthropic_stream(body)
+            else:
+                message = anthropic_message(body, echo)
+                self.send_generated(message, message["usage"]["output_tokens"])
+        elif path == "/v1/chat/completions":
+            if self.inject(raw_body, OPENAI_ERRORS, "openai"):
+                return
+            if body.get("stream"):
+                self.openai_stream(body)
+            else:
+                completion = openai_completion(body, echo)
+                self.send_generated(completion, completion["usage"]["completion_tokens"])
+        elif gemini:
+            if self.inject(raw_body, GEMINI_ERRORS, "gemini"):
+                return
+            self.gemini_generate(
+                body, gemini.group(1), gemini.group(2) == "streamGenerateContent", "alt=sse" in self.path
+            )
+        elif path == "/v1/messages/batches":
+            batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+            with self.state.lock:
+                self.state.message_batches[batch_id] = {"requests": body["requests"], "created": time.time()}
+            self.send_json(self.message_batch(batch_id))
+        elif path == "/v1/batches":
+            batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+            _, content = self.state.files[body["input_file_id"]]
+            with self.state.lock:
+                self.state.batches[batch_id] = {
+                    "endpoint": body["endpoint"],
+                    "input_file_id": body["input_file_id"],
+                    "created": time.time(),
+                    "status": "in_progress",
+                    "output_file_id": None,
+                    "total": sum(1 for line in content.decode("utf-8").splitlines() if line.strip()),
+                    "completed": 0
+                }
+            self.send_json(self.openai_batch(batch_id))
+        else:
+            self.not_found()
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        match = re.fullmatch(r"/v1/messages/batches/([\w-]+)(/results)?", path)
+        if match and match.group(1) in self.state.message_batches:
+            if match.group(2):
+                self.message_batch_results(match.group(1))
+            else:
+                self.send_json(self.message_batch(match.group(1)))
+            return
+
+        match = re.fullmatch(r"/v1/batches/([\w-]+)", path)
+        if match and match.group(1) in self.state.batches:
+            self.send_json(self.openai_batch(match.group(1)))
+            return
+
+        match = re.fullmatch(r"/v1/files/([\w-]+)(/content)?", path)
+        if match and match.group(1) in self.state.files:
+            record, content = self.state.files[match.group(1)]
+            if match.group(2):
+                self.send_text(content.decode("utf-8"))
+            else:
+                self.send_json(record)
+            return
+
+        self.not_found()
+
+def create_server(host="127.0.0.1", port=8765, batch_delay=2.0, behavior=None):
+    """Return a server that has not been started yet; call serve_forever() on it.
+
+    Port 0 picks a free port, which is then server.server_address[1]. The
+    Behavior in use is server.behavior.
+    """
+    state = MockState(batch_delay, behavior)
+    handler = type("Handler", (MockHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.behavior = state.behavior
+    return server
+
+def add_behavior_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Median seconds before the first token of an interactive request (default: 0)")
+    parser.add_argument("--latency-sigma", type=float, default=0.0,
+                        help="Log-normal sigma of the latency; 0 makes it constant (default: 0)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Speed at which replies are generated; 0 sends them at once (default: 0)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Share of interactive requests answered with a 429 (default: 0)")
+    parser.add_argument("--server-error-rate", type=float, default=0.0,
+                        help="Share of interactive requests answered with a 500 or 503 (default: 0)")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="retry-after seconds sent with a 429 (default: 1)")
+    parser.add_argument("--echo-characters", type=int, default=ECHO_CHARACTERS,
+                        help=f"Characters of the source echoed back as the translation (default: {ECHO_CHARACTERS})")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latencies and injected failures (default: 0)")
+
+def behavior_from_args(args):
+    return Behavior(
+        latency=args.latency, latency_sigma=args.latency_sigma, tokens_per_second=args.tokens_per_second,
+        rate_limit_rate=args.rate_limit_rate, server_error_rate=args.server_error_rate, retry_after=args.retry_after,
+        echo_characters=args.echo_characters, seed=args.seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Anthropic, OpenAI and Gemini APIs")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-delay", type=float, default=2.0,
+                        help="Seconds before a submitted batch reports that it has finished (default: 2)")
+    add_behavior_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.batch_delay, behavior_from_args(args))
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""Offline benchmarks of the translator, the web app and the GEMBA evaluator.
+
+Every run talks to benchmarks/mock_llm_server.py instead of a real API, so it
+costs nothing and replays the same latencies and injected failures each time:
+
+    python benchmarks/run_benchmarks.py --targets translate web gemba --files 10 50 --workers 1 8 32
+    python benchmarks/run_benchmarks.py --baseline benchmark_results.json --output new_results.json
+
+Each case (target, provider, corpus size, worker count) runs in a fresh
+process against a synthetic Greek corpus. It reports files per second, time to
+the first output, peak resident memory and retries, as seen by the client and
+by the server. Results are written as JSON; with --baseline, cases are compared
+to an earlier results file and the run fails if any got worse than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+from mock_llm_server import create_server, add_behavior_arguments, behavior_from_args
+
+ROOT = Path(__file__).parent.parent.absolute()
+TRANSLATOR_DIR = ROOT / "translator_scripts copy"
+WEB_APP_DIR = ROOT / "web_app"
+GEMBA_DIR = ROOT / "gemba_evaluators copy"
+
+TARGETS = ("translate", "web", "gemba")
+PROVIDER_SCRIPTS = {"claude": "translator_claude", "gpt4o": "translator_gpt4o", "gemini": "translator_gemini"}
+
+# Quotas high enough that only the worker count limits concurrency
+UNLIMITED_REQUESTS_PER_MINUTE = "1000000"
+UNLIMITED_TOKENS_PER_MINUTE = "1000000000"
+
+# How each metric compares between runs: True when higher is better
+METRIC_DIRECTIONS = {
+    "files_per_second": True,
+    "first_output_seconds": False,
+    "peak_rss_mb": False,
+    "retries": False,
+    "server_retries": False,
+    "failed": False
+}
+
+GREEK_WORDS = (
+    "ὁ ἡ τό καί δέ μέν γάρ οὖν ἀλλά οὐ μή ἐν εἰς ἐκ πρός περί διά κατά ὑπό ἐπί "
+    "λόγος ψυχή ἀρετή πόλις νόμος δίκη σοφία ἀλήθεια φύσις θεός ἄνθρωπος βίος "
+    "ἔφη λέγει ἐστί εἶναι ἔχει ποιεῖν γίγνεται δοκεῖ φησί οἶμαι ἀληθῆ καλόν ἀγαθόν "
+    "Σωκράτης Γλαύκων Ἀδείμαντος Θρασύμαχος Πολέμαρχος Κέφαλος"
+).split()
+
+def make_corpus(directory, files, paragraphs, seed=0):
+    """Write a deterministic corpus of Greek chapters; returns the directory."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for number in range(1, files + 1):
+        rng = random.Random(f"{seed}:{number}")
+        chapter = []
+        for _ in range(paragraphs):
+            sentences = []
+            for _ in range(rng.randint(3, 6)):
+                words = rng.choices(GREEK_WORDS, k=rng.randint(8, 20))
+                sentences.append(" ".join(words).capitalize() + rng.choice((".", ";", "·")))
+            chapter.append(" ".join(sentences))
+        (directory / f"Book_1_Chapter_{number:02d}.txt").write_text("\n\n".join(chapter), encoding="utf-8")
+    return directory
+
+class FirstOutputWatcher:
+    """Poll a directory for the first file with content, and record when it appeared."""
+
+    def __init__(self, directory, start_time, ignore=(".journal.sqlite3",)):
+        self.directory = Path(directory)
+        self.start_time = start_time
+        self.ignore = ignore
+        self.seconds = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set() and self.seconds is None:
+            if self.directory.exists():
+                for entry in os.scandir(self.directory):
+                    if entry.is_file() and not entry.name.startswith(self.ignore) and entry.stat().st_size:
+                        self.seconds = time.monotonic() - self.start_time
+                        return
+            time.sleep(0.005)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.seconds
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+# Cases, each run in a child process
+
+def run_translate_case(case, work_dir):
+    sys.path.insert(0, str(TRANSLATOR_DIR))
+    script = __import__(PROVIDER_SCRIPTS[case["provider"]])
+    from translate import main as translate_main
+    output = work_dir / "output"
+    sys.argv = [
+        f"{script.__name__}.py", "--provider", case["provider"], "--source", case["corpus"], "--output", str(output),
+        "--workers", str(case["workers"]), "--no-cache",
+        "--requests-per-minute", UNLIMITED_REQUESTS_PER_MINUTE, "--tokens-per-minute", UNLIMITED_TOKENS_PER_MINUTE
+    ]
+
+    start_time = time.monotonic()
+    watcher = FirstOutputWatcher(output, start_time)
+    if case["provider"] == "claude":
+        script.main()
+    else:
+        translate_main(default_provider=case["provider"])
+    wall_time = time.monotonic() - start_time
+
+    with open(output / "translation_summary.json", 'r', encoding='utf-8') as summary_file:
+        summary = json.load(summary_file)
+    return {
+        "wall_seconds": wall_time,
+        "first_output_seconds": watcher.stop(),
+        "completed": summary["completed"],
+        "failed": summary["failed"],
+        "retries": summary["telemetry"]["retries"]
+    }
+
+def run_web_case(case, work_dir):
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    os.environ["TRANSLATION_CONCURRENCY"] = str(case["workers"])
+    sys.path.insert(0, str(WEB_APP_DIR))
+    import app as web_app
+    import metrics
+
+    texts = [path.read_text(encoding="utf-8") for path in sorted(Path(case["corpus"]).glob("*.txt"))]
+    client = web_app.app.test_client()
+
+    def translate(text):
+        response = client.post("/api/translate", data={"api_key": "benchmark", "text": text})
+        return response.status_code == 200
+
+    start_time = time.monotonic()
+    first_output = None
+    completed = 0
+    with ThreadPoolExecutor(max_workers=case["workers"]) as executor:
+        for future in as_completed([executor.submit(translate, text) for text in texts]):
+            if first_output is None:
+                first_output = time.monotonic() - start_time
+            completed += future.result()
+    wall_time = time.monotonic() - start_time
+
+    retries = sum(sample.value for family in metrics.RETRIES.collect() for sample in family.samples
+                  if sample.name.endswith("_total"))
+    return {
+        "wall_seconds": wall_time,
+        "first_output_seconds": first_output,
+        "completed": completed,
+        "failed": len(texts) - completed,
+        "retries": int(retries)
+    }
+
+def run_gemba_case(case, work_dir):
+    # The judge needs translations to score; the mock's are as good as any
+    translations = work_dir / "benchmark_translations"
+    translations.mkdir()
+    for path in Path(case["corpus"]).glob("*.txt"):
+        (translations / path.name).write_text(f"Translation of {path.name}.", encoding="utf-8")
+
+    sys.path.insert(0, str(GEMBA_DIR))
+    import gemba_evaluate
+    output = work_dir / "output"
+    sys.argv = [
+        "gemba_evaluate.py", "--source", case["corpus"], "--translations", str(translations), "--output", str(output),
+        "--workers", str(case["workers"]), "--no-cache",
+        "--requests-per-minute", UNLIMITED_REQUESTS_PER_MINUTE, "--tokens-per-minute", UNLIMITED_TOKENS_PER_MINUTE
+    ]
+
+    start_time = time.monotonic()
+    watcher = FirstOutputWatcher(output, start_time)
+    gemba_evaluate.main()
+    wall_time = time.monotonic() - start_time
+
+    results_path = output / "gemba_results.jsonl"
+    with open(results_path, 'r', encoding='utf-8') as results_file:
+        completed = sum(1 for line in results_file if line.strip())
+    return {
+        "wall_seconds": wall_time,
+        "first_output_seconds": watcher.stop(),
+        "completed": completed,
+        "failed": case["files"] - completed,
+        # The evaluator does not report its retries; the server's count is in "server"
+        "retries": None
+    }
+
+CASE_RUNNERS = {"translate": run_translate_case, "web": run_web_case, "gemba": run_gemba_case}
+
+def run_case_in_process(case):
+    """Run one case in this process and print its measurements as the last line of output."""
+    work_dir = Path(tempfile.mkdtemp(prefix="book_translator_benchmark_"))
+    # Logs, outputs and caches all go to the scratch directory
+    os.chdir(work_dir)
+    os.environ["BOOK_TRANSLATOR_CACHE_DIR"] = str(work_dir / "cache")
+    try:
+        measurements = CASE_RUNNERS[case["target"]](case, work_dir)
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    measurements["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(measurements))
+
+# Orchestration
+
+def case_name(case):
+    target = case["target"] if case["target"] != "translate" else f"translate/{case['provider']}"
+    return f"{target}/files={case['files']}/workers={case['workers']}"
+
+def run_case(case, base_url, behavior, timeout):
+    """Run a case in a child process against the mock server and return its result entry."""
+    env = dict(
+        os.environ,
+        ANTHROPIC_BASE_URL=base_url,
+        OPENAI_BASE_URL=f"{base_url}/v1",
+        GEMINI_BASE_URL=base_url,
+        ANTHROPIC_API_KEY="benchmark",
+        OPENAI_API_KEY="benchmark",
+        GOOGLE_API_KEY="benchmark",
+        PYTHONUNBUFFERED="1"
+    )
+    behavior.reset()
+    completed = subprocess.run(
+        [sys.executable, str(Path(__file__).absolute()), "--case", json.dumps(case)],
+        env=env, capture_output=True, text=True, timeout=timeout
+    )
+    result = {"case": case_name(case), **{key: case[key] for key in ("target", "provider", "files", "workers")}}
+    if completed.returncode != 0:
+        result["error"] = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"
+        return result
+
+    measurements = json.loads(completed.stdout.strip().splitlines()[-1])
+    wall_time = measurements.pop("wall_seconds")
+    result.update({
+        "wall_seconds": round(wall_time, 3),
+        "files_per_second": round(case["files"] / wall_time, 3) if wall_time else None,
+        "first_output_seconds": round(measurements.pop("first_output_seconds"), 3)
+        if measurements.get("first_output_seconds") is not None else None,
+        **measurements
+    })
+    # Repeats seen by the server include the retries the SDKs make on their own
+    server = behavior.snapshot()
+    result["server_retries"] = server.get("repeated_requests", 0)
+    result["server"] = server
+    return result
+
+def compare(baseline, current, tolerance):
+    """Return the regressions of current against baseline, as (case, metric, old, new) tuples."""
+    previous = {result["case"]: result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get(result["case"])
+        if old is None:
+            continue
+        for metric, higher_is_better in METRIC_DIRECTIONS.items():
+            old_value, new_value = old.get(metric), result.get(metric)
+            if old_value is None or new_value is None:
+                continue
+            if higher_is_better:
+                worse = new_value < old_value * (1 - tolerance)
+            else:
+                # Counts that were zero regress as soon as they appear
+                worse = new_value > old_value * (1 + tolerance) if old_value else new_value > 0
+            if worse:
+                regressions.append((result["case"], metric, old_value, new_value))
+    return regressions
+
+def print_table(results):
+    columns = ("case", "files_per_second", "first_output_seconds", "peak_rss_mb", "retries", "server_retries", "failed")
+    print("  ".join(f"{column:>20}" if i else f"{column:<40}" for i, column in enumerate(columns)))
+    for result in results:
+        if "error" in result:
+            print(f"{result['case']:<40}  error: {result['error']}")
+            continue
+        cells = [f"{result['case']:<40}"] + [f"{str(result.get(column)):>20}" for column in columns[1:]]
+        print("  ".join(cells))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the translator, web app and GEMBA evaluator offline")
+    parser.add_argument("--targets", type=str, nargs="+", choices=TARGETS, default=["translate"],
+                        help="What to benchmark (default: translate)")
+    parser.add_argument("--providers", type=str, nargs="+", choices=sorted(PROVIDER_SCRIPTS), default=["claude"],
+                        help="Providers for the translate target (default: claude)")
+    parser.add_argument("--files", type=int, nargs="+", default=[10],
+                        help="Corpus sizes in files (default: 10)")
+    parser.add_argument("--paragraphs", type=int, default=8, help="Paragraphs per file (default: 8)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8],
+                        help="Worker counts (default: 1 8)")
+    parser.add_argument("--output", type=str, default="benchmark_results.json",
+                        help="Results file (default: benchmark_results.json)")
+    parser.add_argument("--baseline", type=str, help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Relative change that counts as a regression (default: 0.15)")
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds allowed per case (default: 900)")
+    parser.add_argument("--case", type=str, help=argparse.SUPPRESS)
+    add_behavior_arguments(parser)
+    # Defaults that resemble a loaded production API rather than an instant one
+    parser.set_defaults(latency=0.3, latency_sigma=0.5, tokens_per_second=400, rate_limit_rate=0.02,
+                        server_error_rate=0.01, retry_after=0.5, echo_characters=2000)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case_in_process(json.loads(args.case))
+        return
+
+    behavior = behavior_from_args(args)
+    server = create_server(port=0, batch_delay=1.0, behavior=behavior)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    corpus_root = Path(tempfile.mkdtemp(prefix="book_translator_corpus_"))
+    cases = []
+    for files in args.files:
+        corpus = make_corpus(corpus_root / f"files_{files}", files, args.paragraphs, args.seed)
+        for target in args.targets:
+            for provider in (args.providers if target == "translate" else [None]):
+                for workers in args.workers:
+                    cases.append({
+                        "target": target, "provider": provider, "files": files, "workers": workers,
+                        "corpus": str(corpus)
+                    })
+
+    results = []
+    for number, case in enumerate(cases, 1):
+        print(f"[{number}/{len(cases)}] {case_name(case)}", file=sys.stderr)
+        results.append(run_case(case, base_url, behavior, args.timeout))
+    server.shutdown()
+    shutil.rmtree(corpus_root, ignore_errors=True)
+
+    report = {
+        "created": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "mock": {
+            key: getattr(args, key) for key in (
+                "latency", "latency_sigma", "tokens_per_second", "rate_limit_rate", "server_error_rate",
+                "retry_after", "echo_characters", "seed"
+            )
+        },
+        "corpus": {"paragraphs_per_file": args.paragraphs},
+        "results": results
+    }
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2)
+    print_table(results)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("mock") != report["mock"]:
+            print("Warning: the baseline was run with different mock server settings", file=sys.stderr)
+        regressions = compare(baseline, report, args.tolerance)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name}: {metric} {old} -> {new}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
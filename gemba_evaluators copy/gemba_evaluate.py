@@ -0,0 +1,417 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from dotenv import load_dotenv
+from tqdm import tqdm
+import openai
+
+# The rate limiter and cache are shared with the translator scripts
+sys.path.append(str(Path(__file__).parent.parent / "translator_scripts copy"))
+from rate_limiter import AdaptiveRateLimiter, estimate_tokens
+from disk_cache import EvaluationCache, hash_key
+from providers import OpenAIProvider, add_usage, empty_usage
+from batch_jobs import load_batch_state, save_batch_state, wait_for_batch
+from gemba_mqm import TEMPLATE_GEMBA_MQM, apply_template, parse_mqm
+from mqm_report import write_report
+from segment_alignment import SEGMENT_LEVELS, align_segments
+
+# Load environment variables from .env file if it exists
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("gemba_evaluate.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# The system prompt and the three few-shot conversations come before the chapter
+# in every request, so OpenAI serves them from its prompt cache after the first
+# call. The cache key routes all requests with this prefix to the same cache.
+PROMPT_CACHE_KEY = "gemba-mqm-" + hash_key(json.dumps(TEMPLATE_GEMBA_MQM, ensure_ascii=False))[:16]
+
+def system_name(translation_folder):
+    """Name a system after its folder, e.g. claude_translations_11.14.24 -> claude."""
+    name = Path(translation_folder).name
+    return name.split("_translations")[0] if "_translations" in name else name
+
+def pair_hash(source_text, translation_text):
+    """Hash of the texts a unit was scored on, so an edited source or a new translation is scored again."""
+    return hash_key(source_text, translation_text)
+
+def read_records(results_path):
+    records = []
+    if not results_path.exists():
+        return records
+    with open(results_path, 'r', encoding='utf-8') as results_file:
+        for line in results_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A run that was killed mid-write can leave a partial last line
+                continue
+    return records
+
+def load_completed(results_path):
+    """Return the (system, file, segment, pair hash) units already recorded in a results file; segment is None for whole chapters."""
+    return {
+        (record["system"], record["file"], record.get("segment"), record.get("pair_hash"))
+        for record in read_records(results_path)
+    }
+
+def prune_stale_results(results_path, units):
+    """Drop the results of the chapters in units that were scored on other texts, and return how many were dropped.
+
+    A chapter whose source or translation changed, or whose new alignment has
+    fewer segments, would otherwise keep its old scores next to the new ones.
+    Results of chapters that are not in units are kept.
+    """
+    current = {tuple(unit[:3]): pair_hash(*unit[3:]) for unit in units}
+    chapters = {unit[:2] for unit in units}
+    records = read_records(results_path)
+    kept = [
+        record for record in records
+        if (record["system"], record["file"]) not in chapters
+        or current.get((record["system"], record["file"], record.get("segment"))) == record.get("pair_hash")
+    ]
+    if len(kept) < len(records):
+        temporary_path = results_path.with_name(results_path.name + ".tmp")
+        with open(temporary_path, 'w', encoding='utf-8') as results_file:
+            for record in kept:
+                results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(temporary_path, results_path)
+    return len(records) - len(kept)
+
+def find_pairs(source_folder, translation_folders):
+    """List (system, filename, source_file, translation_file) for every chapter that has a translation."""
+    pairs = []
+    for translation_folder in translation_folders:
+        system = system_name(translation_folder)
+        for filename in sorted(os.listdir(source_folder)):
+            if not filename.endswith(".txt"):
+                continue
+            translation_file = os.path.join(translation_folder, filename)
+            if os.path.exists(translation_file):
+                pairs.append((system, filename, os.path.join(source_folder, filename), translation_file))
+            else:
+                logger.warning(f"No matching translation file for {filename} in {translation_folder}")
+    return pairs
+
+async def judge(client, limiter, prompts, model, max_retries=5, retry_delay=2):
+    """Send one GEMBA-MQM prompt to the judge model under the shared rate limit.
+
+    Returns the judge's answer and the token usage, including cached prompt tokens.
+    """
+    estimated_tokens = estimate_tokens("".join(turn["content"] for turn in prompts))
+    for attempt in range(max_retries):
+        try:
+            async with limiter.slot(estimated_tokens):
+                start_time = time.monotonic()
+                raw_response = await client.chat.completions.with_raw_response.create(
+                    model=model, messages=prompts, extra_body={"prompt_cache_key": PROMPT_CACHE_KEY}
+                )
+                limiter.record_success(time.monotonic() - start_time, raw_response.headers)
+            response = raw_response.parse()
+            return response.choices[0].message.content, OpenAIProvider.usage_of(response.usage)
+        except openai.RateLimitError as e:
+            wait_time = limiter.record_rate_limited(e.response.headers, default_wait=retry_delay * (2 ** attempt))
+            logger.warning(f"Rate limit exceeded. Pausing requests for {wait_time:.1f} seconds.")
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            if attempt == max_retries - 1:
+                raise
+            wait_time = retry_delay * (2 ** attempt)
+            logger.warning(f"API error: {str(e)}. Retrying in {wait_time} seconds.")
+            await asyncio.sleep(wait_time)
+    raise Exception(f"Failed to evaluate after {max_retries} attempts")
+
+def load_pair(source_file, translation_file):
+    with open(source_file, 'r', encoding='utf-8') as file:
+        source_text = file.read()
+
+    with open(translation_file, 'r', encoding='utf-8') as file:
+        translation_text = file.read()
+
+    return source_text, translation_text
+
+def build_units(pairs, segment_level=None):
+    """Expand chapter pairs into the (system, file, segment, source text, translation) units to score.
+
+    Without a segment level each chapter is one unit with segment None. With
+    one, the chapter and its translation are split into paragraphs or sentences
+    and aligned (see segment_alignment), and each aligned pair is a numbered unit.
+    """
+    units = []
+    for system, filename, source_file, translation_file in pairs:
+        source_text, translation_text = load_pair(source_file, translation_file)
+        if segment_level is None:
+            units.append((system, filename, None, source_text, translation_text))
+            continue
+        for segment, (source_segment, translated_segment) in enumerate(
+            align_segments(source_text, translation_text, segment_level)
+        ):
+            units.append((system, filename, segment, source_segment, translated_segment))
+    return units
+
+def unit_name(system, filename, segment):
+    return f"{system}/{filename}" if segment is None else f"{system}/{filename}#{segment}"
+
+def result_record(system, filename, segment, unit_hash, judge_model, evaluation, usage):
+    record = {"system": system, "file": filename}
+    if segment is not None:
+        record["segment"] = segment
+    return {**record, "pair_hash": unit_hash, "judge_model": judge_model, **evaluation, "usage": usage}
+
+def build_prompts(source_text, translation_text, source_lang, target_lang):
+    input_data = {
+        "source_lang": source_lang,
+        "source_seg": source_text,
+        "target_lang": target_lang,
+        "target_seg": translation_text
+    }
+    return apply_template(TEMPLATE_GEMBA_MQM, input_data)
+
+def score_response(evaluation_result):
+    """Return the raw judge answer with its parsed errors and score."""
+    errors, score = parse_mqm(evaluation_result)
+    return {
+        "response": evaluation_result,
+        "errors": errors,
+        "score": score
+    }
+
+async def process_pair(client, limiter, source_text, translation_text, model, source_lang, target_lang, cache=None):
+    """Score one chapter or segment translation and return the raw judge answer with its parsed errors and token usage."""
+    # Unchanged (source, translation) pairs are never sent to the judge twice
+    cache_key = (source_text, translation_text, TEMPLATE_GEMBA_MQM, model, source_lang, target_lang)
+    if cache is not None:
+        cached = cache.get_evaluation(*cache_key)
+        if cached is not None:
+            return {**cached, "usage": empty_usage()}
+
+    prompts = build_prompts(source_text, translation_text, source_lang, target_lang)
+    evaluation_result, usage = await judge(client, limiter, prompts, model)
+
+    evaluation = score_response(evaluation_result)
+    if cache is not None:
+        cache.put_evaluation(*cache_key, evaluation)
+    return {**evaluation, "usage": usage}
+
+async def evaluate(client, limiter, units, results_path, args, cache=None):
+    """Score all units concurrently, appending each result to results_path as soon as it arrives."""
+    async def score(system, filename, segment, source_text, translation_text):
+        try:
+            result = await process_pair(
+                client, limiter, source_text, translation_text, args.judge_model, args.source_lang, args.target_lang,
+                cache
+            )
+            usage = result.pop("usage")
+            return result_record(
+                system, filename, segment, pair_hash(source_text, translation_text), args.judge_model, result, usage
+            )
+        except Exception as e:
+            logger.error(f"Failed to evaluate {unit_name(system, filename, segment)}: {str(e)}")
+            return None
+
+    tasks = [asyncio.create_task(score(*unit)) for unit in units]
+    failed = 0
+    usage = empty_usage()
+    with open(results_path, 'a', encoding='utf-8') as results_file:
+        for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Evaluating"):
+            record = await task
+            if record is None:
+                failed += 1
+                continue
+            add_usage(usage, record["usage"])
+            results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            results_file.flush()
+    log_usage(usage)
+    return failed
+
+def log_usage(usage):
+    logger.info(
+        f"Prompt tokens: {usage['input_tokens'] + usage['cache_read_tokens']} "
+        f"({usage['cache_read_tokens']} read from the prompt cache), "
+        f"completion tokens: {usage['output_tokens']}"
+    )
+
+async def evaluate_batch(judge_provider, units, results_path, args, cache=None):
+    """Score all units in one OpenAI batch job, appending results to results_path like evaluate().
+
+    The batch id is kept in gemba_batch_state.json next to the results, so an
+    interrupted run collects the same batch instead of submitting a new one.
+    """
+    state_path = results_path.with_name(results_path.name.replace("_results.jsonl", "_batch_state.json"))
+    state = load_batch_state(state_path)
+    if state is not None and state["judge_model"] != args.judge_model:
+        logger.warning(f"Ignoring {state_path}: it belongs to judge model {state['judge_model']}")
+        state = None
+    # Texts are looked up again when the batch finishes rather than kept in the state file
+    texts = {tuple(unit[:3]): unit[3:] for unit in units}
+    failed = 0
+    usage = empty_usage()
+
+    with open(results_path, 'a', encoding='utf-8') as results_file:
+        def write_record(system, filename, segment, unit_hash, evaluation, record_usage):
+            add_usage(usage, record_usage)
+            record = result_record(system, filename, segment, unit_hash, args.judge_model, evaluation, record_usage)
+            results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            results_file.flush()
+
+        if state is None:
+            state = {"judge_model": args.judge_model, "batch_id": None, "requests": {}}
+            requests = {}
+            for number, (system, filename, segment, source_text, translation_text) in enumerate(units):
+                cache_key = (source_text, translation_text, TEMPLATE_GEMBA_MQM, args.judge_model, args.source_lang, args.target_lang)
+                cached = cache.get_evaluation(*cache_key) if cache is not None else None
+                if cached is not None:
+                    write_record(system, filename, segment, pair_hash(source_text, translation_text), cached, empty_usage())
+                    continue
+                custom_id = f"pair{number}"
+                requests[custom_id] = {
+                    "model": args.judge_model,
+                    "messages": build_prompts(source_text, translation_text, args.source_lang, args.target_lang),
+                    "prompt_cache_key": PROMPT_CACHE_KEY
+                }
+                state["requests"][custom_id] = [system, filename, segment, pair_hash(source_text, translation_text)]
+
+            if not requests:
+                log_usage(usage)
+                return failed
+            state["batch_id"] = await judge_provider.submit_batch(requests)
+            logger.info(f"Submitted batch {state['batch_id']} with {len(requests)} requests")
+            save_batch_state(state_path, state)
+        else:
+            logger.info(f"Resuming batch {state['batch_id']} with {len(state['requests'])} requests")
+
+        await wait_for_batch(judge_provider, state["batch_id"], args.poll_interval)
+        results = await judge_provider.batch_results(state["batch_id"])
+
+        for custom_id, (system, filename, segment, unit_hash) in state["requests"].items():
+            response = results.get(custom_id, "missing from batch results")
+            if isinstance(response, str):
+                logger.error(f"Failed to evaluate {unit_name(system, filename, segment)}: {response}")
+                failed += 1
+                continue
+            evaluation = score_response(response.text)
+            # A pair edited since the batch was submitted is recorded under the submitted texts' hash and scored again next run
+            source_text, translation_text = texts.get((system, filename, segment), (None, None))
+            if cache is not None and source_text is not None and pair_hash(source_text, translation_text) == unit_hash:
+                cache.put_evaluation(
+                    source_text, translation_text, TEMPLATE_GEMBA_MQM, args.judge_model,
+                    args.source_lang, args.target_lang, evaluation
+                )
+            write_record(system, filename, segment, unit_hash, evaluation, response.usage)
+
+    log_usage(usage)
+    state_path.unlink()
+    return failed
+
+def write_system_results(results_path, output_directory, suffix=""):
+    """Write <system><suffix>_evaluation_results.json files in the layout of the original evaluator scripts.
+
+    The errors of a chapter's segments are listed together under the chapter.
+    """
+    records = read_records(results_path)
+
+    by_system = {}
+    for record in sorted(records, key=lambda record: record.get("segment") or 0):
+        chapter = by_system.setdefault(record["system"], {}).setdefault(record["file"], {})
+        for severity, errors in record["errors"].items():
+            chapter.setdefault(severity, []).extend(errors)
+
+    for system, results in by_system.items():
+        system_path = Path(output_directory) / f"{system}{suffix}_evaluation_results.json"
+        with open(system_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(results.items())), f, ensure_ascii=False, indent=2)
+        logger.info(f"Results for {system} saved to {system_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Score translations with GEMBA-MQM")
+    parser.add_argument("--source", type=str, required=True, help="Directory containing the source text files")
+    parser.add_argument("--translations", type=str, nargs="+", required=True,
+                        help="One or more translation directories to evaluate, e.g. Translations/claude_translations_11.14.24")
+    parser.add_argument("--output", type=str, default=".",
+                        help="Directory for gemba_results.jsonl and the per-system result files (default: current directory)")
+    parser.add_argument("--judge-model", type=str, default="gpt-4o", help="OpenAI model used as the judge (default: gpt-4o)")
+    parser.add_argument("--api-key", type=str, help="OpenAI API key (optional, can use OPENAI_API_KEY)")
+    parser.add_argument("--source-lang", type=str, default="Ancient Greek")
+    parser.add_argument("--target-lang", type=str, default="English")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum number of concurrent judge requests (default: 8)")
+    parser.add_argument("--requests-per-minute", type=int, default=500,
+                        help="Requests-per-minute quota to pace against (default: 500)")
+    parser.add_argument("--tokens-per-minute", type=int, default=30000,
+                        help="Tokens-per-minute quota to pace against (default: 30000)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit all pending pairs as one OpenAI batch job and wait for it")
+    parser.add_argument("--poll-interval", type=float, default=60,
+                        help="Seconds between batch status checks (default: 60)")
+    parser.add_argument("--cache-path", type=str,
+                        help="SQLite evaluation cache file (default: ~/.cache/book_translator/evaluations.sqlite3)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the evaluation cache")
+    parser.add_argument("--segment-level", type=str, choices=SEGMENT_LEVELS,
+                        help="Score aligned paragraph or sentence pairs instead of whole chapters")
+    parser.add_argument("--restart", action="store_true",
+                        help="Discard earlier results instead of resuming where the last run stopped")
+    args = parser.parse_args()
+
+    api_key = args.api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        logger.error("No API key provided. Set OPENAI_API_KEY environment variable or provide it as an argument.")
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    # Segment-level results are kept apart from chapter-level ones, e.g. gemba_sentence_results.jsonl
+    suffix = f"_{args.segment_level}" if args.segment_level else ""
+    results_path = Path(args.output) / f"gemba{suffix}_results.jsonl"
+    if args.restart and results_path.exists():
+        results_path.unlink()
+
+    # Resume: skip every (system, chapter, segment) unit that already has a result for the same texts
+    units = build_units(find_pairs(args.source, args.translations), args.segment_level)
+    stale = prune_stale_results(results_path, units)
+    if stale:
+        logger.info(f"Dropped {stale} results scored on an earlier source or translation")
+    completed = load_completed(results_path)
+    units = [unit for unit in units if (*unit[:3], pair_hash(*unit[3:])) not in completed]
+    logger.info(f"{len(completed)} {args.segment_level or 'chapter'} pairs already evaluated, {len(units)} to go")
+
+    cache = None if args.no_cache else EvaluationCache(args.cache_path)
+    if args.batch:
+        judge_provider = OpenAIProvider(model=args.judge_model, api_key=api_key)
+        failed = asyncio.run(evaluate_batch(judge_provider, units, results_path, args, cache))
+    else:
+        # judge retries on its own, so the shared rate limiter sees every 429
+        client = openai.AsyncOpenAI(api_key=api_key, max_retries=0)
+        limiter = AdaptiveRateLimiter(
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+            max_concurrency=args.workers
+        )
+        failed = asyncio.run(evaluate(client, limiter, units, results_path, args, cache))
+
+    write_system_results(results_path, args.output, suffix)
+    report_path = Path(args.output) / f"mqm{suffix}_report.json"
+    report = write_report([results_path], report_path)
+    for system, summary in report["systems"].items():
+        logger.info(
+            f"{system}: mean MQM {summary['mean_score']} "
+            f"({summary['ci_low']} to {summary['ci_high']}) over {summary['segments']} segments"
+        )
+    logger.info(f"Corpus report saved to {report_path}")
+    logger.info(f"Evaluation complete. {len(units) - failed} pairs scored, {failed} failed. Results in {results_path}")
+    if cache is not None:
+        logger.info(f"Cache hits: {cache.hits}, misses: {cache.misses}")
+
+if __name__ == "__main__":
+    main()
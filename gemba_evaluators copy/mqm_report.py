@@ -0,0 +1,257 @@
+"""Corpus-level aggregation of GEMBA-MQM results.
+
+Loads every scored segment into columnar arrays and reports, per system, the
+mean MQM score with a bootstrap confidence interval, per-chapter rollups, error
+counts by severity and error class, and paired bootstrap significance tests
+between systems:
+
+    python mqm_report.py gemba_results.jsonl --output mqm_report.json
+
+Results can come from gemba_results.jsonl files or from the
+<system>_evaluation_results.json files of the original evaluator scripts.
+"""
+import json
+import logging
+import argparse
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from gemba_mqm import parse_error_class
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ("critical", "major", "minor")
+# As in parse_mqm_answer: the first five errors count, most severe first, up to 25 points
+SEVERITY_WEIGHTS = np.array([25, 5, 1])
+MAX_COUNTED_ERRORS = 5
+MAX_PENALTY = 25
+
+# Resampled values held in memory at once while bootstrapping
+BOOTSTRAP_BLOCK_ELEMENTS = 2_000_000
+
+def _records_from_file(path):
+    """Yield (system, file, segment, errors) from a results file of either layout."""
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        with open(path, 'r', encoding='utf-8') as results_file:
+            for line in results_file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run that was killed mid-write can leave a partial last line
+                    continue
+                yield record["system"], record["file"], record.get("segment", 0), record.get("errors") or {}
+    else:
+        system = path.stem.replace("_evaluation_results", "")
+        with open(path, 'r', encoding='utf-8') as results_file:
+            for filename, errors in json.load(results_file).items():
+                yield system, filename, 0, errors or {}
+
+def load_results(paths):
+    """Return (segments, errors) DataFrames for all results files.
+
+    segments has one row per (system, file, segment) with its error counts by
+    severity; errors has one row per error with its severity and class. A
+    segment scored more than once keeps its last result.
+    """
+    latest = {}
+    for path in paths:
+        for system, filename, segment, errors in _records_from_file(path):
+            latest[(system, filename, segment)] = errors
+
+    keys = list(latest)
+    counts = np.zeros((len(keys), len(SEVERITIES)), dtype=np.int64)
+    error_rows = {"row": [], "severity": [], "description": []}
+    for row, key in enumerate(keys):
+        for column, severity in enumerate(SEVERITIES):
+            entries = latest[key].get(severity) or []
+            counts[row, column] = len(entries)
+            for entry in entries:
+                error_rows["row"].append(row)
+                error_rows["severity"].append(severity)
+                # Errors parsed from JSON answers are {"class": ...} objects
+                error_rows["description"].append(entry.get("class", "") if isinstance(entry, dict) else str(entry))
+
+    segments = pd.DataFrame(keys, columns=["system", "file", "segment"])
+    for column, severity in enumerate(SEVERITIES):
+        segments[severity] = counts[:, column]
+    segments["score"] = mqm_scores(counts)
+
+    errors = pd.DataFrame(error_rows)
+    errors["system"] = segments["system"].to_numpy()[errors["row"].to_numpy(dtype=np.int64)]
+    # Descriptions repeat across segments, so each distinct one is classified once
+    descriptions = errors["description"].astype("category")
+    classes = pd.Series(descriptions.cat.categories).map(parse_error_class).to_numpy()
+    errors["error_class"] = classes[descriptions.cat.codes.to_numpy()]
+    return segments, errors.drop(columns=["row", "description"])
+
+def mqm_scores(counts):
+    """Score segments from an (n, 3) array of critical, major and minor error counts, as parse_mqm_answer does."""
+    counted = np.zeros_like(counts)
+    remaining = np.full(len(counts), MAX_COUNTED_ERRORS)
+    for column in range(len(SEVERITIES)):
+        counted[:, column] = np.minimum(counts[:, column], remaining)
+        remaining -= counted[:, column]
+    return -np.minimum(counted @ SEVERITY_WEIGHTS, MAX_PENALTY)
+
+def bootstrap_means(values, resamples, rng):
+    """Return the means of resamples bootstrap resamples of values."""
+    values = np.asarray(values, dtype=float)
+    means = np.empty(resamples)
+    rows = max(1, BOOTSTRAP_BLOCK_ELEMENTS // max(len(values), 1))
+    for start in range(0, resamples, rows):
+        stop = min(resamples, start + rows)
+        indexes = rng.integers(0, len(values), size=(stop - start, len(values)))
+        means[start:stop] = values[indexes].mean(axis=1)
+    return means
+
+def confidence_interval(means, confidence):
+    low, high = np.quantile(means, [(1 - confidence) / 2, 1 - (1 - confidence) / 2])
+    return round(float(low), 4), round(float(high), 4)
+
+def system_scores(segments, resamples, confidence, rng):
+    """Mean score, bootstrap confidence interval and error counts of each system."""
+    summary = {}
+    for system, group in segments.groupby("system", sort=True):
+        scores = group["score"].to_numpy()
+        low, high = confidence_interval(bootstrap_means(scores, resamples, rng), confidence)
+        summary[system] = {
+            "segments": len(group),
+            "mean_score": round(float(scores.mean()), 4),
+            "ci_low": low,
+            "ci_high": high,
+            "errors": {severity: int(group[severity].sum()) for severity in SEVERITIES},
+            "errors_per_segment": round(float(group[list(SEVERITIES)].to_numpy().sum(axis=1).mean()), 4)
+        }
+    return summary
+
+def chapter_scores(segments):
+    """Roll the segment scores of each system up to its chapters."""
+    table = segments.groupby(["system", "file"], sort=True).agg(
+        segments=("score", "size"),
+        mean_score=("score", "mean"),
+        min_score=("score", "min"),
+        **{severity: (severity, "sum") for severity in SEVERITIES}
+    )
+    chapters = {}
+    for (system, filename), row in table.iterrows():
+        chapters.setdefault(system, {})[filename] = {
+            "segments": int(row["segments"]),
+            "mean_score": round(float(row["mean_score"]), 4),
+            "min_score": int(row["min_score"]),
+            "errors": {severity: int(row[severity]) for severity in SEVERITIES}
+        }
+    return chapters
+
+def error_class_counts(errors):
+    """Count errors by system, error class and severity."""
+    if errors.empty:
+        return {}
+    table = pd.crosstab([errors["system"], errors["error_class"]], errors["severity"])
+    table = table.reindex(columns=list(SEVERITIES), fill_value=0)
+    table["total"] = table.sum(axis=1)
+    counts = {}
+    for (system, error_class), row in table.iterrows():
+        counts.setdefault(system, {})[error_class] = {column: int(value) for column, value in row.items()}
+    return counts
+
+def pairwise_significance(segments, resamples, confidence, rng):
+    """Paired bootstrap test of the score difference of every pair of systems on their shared segments.
+
+    The p-value is two-sided: the share of resampled mean differences, centered
+    on zero, that are at least as far from zero as the observed one.
+    """
+    scores = segments.pivot_table(index=["file", "segment"], columns="system", values="score", aggfunc="last")
+    systems = sorted(scores.columns)
+    comparisons = []
+    for i, system_a in enumerate(systems):
+        for system_b in systems[i + 1:]:
+            shared = scores[[system_a, system_b]].dropna().to_numpy()
+            if not len(shared):
+                continue
+            deltas = shared[:, 0] - shared[:, 1]
+            observed = deltas.mean()
+            means = bootstrap_means(deltas, resamples, rng)
+            low, high = confidence_interval(means, confidence)
+            extreme = np.count_nonzero(np.abs(means - observed) >= abs(observed))
+            # A single shared segment has no sampling variance to test against
+            p_value = float(extreme + 1) / (resamples + 1) if len(deltas) > 1 else None
+            comparisons.append({
+                "system_a": system_a,
+                "system_b": system_b,
+                "segments": len(deltas),
+                "mean_delta": round(float(observed), 4),
+                "ci_low": low,
+                "ci_high": high,
+                "p_value": round(p_value, 4) if p_value is not None else None,
+                "significant": bool(p_value is not None and p_value < 1 - confidence)
+            })
+    return comparisons
+
+def build_report(paths, resamples=1000, confidence=0.95, seed=0):
+    """Aggregate the results files into a report dict."""
+    segments, errors = load_results(paths)
+    rng = np.random.default_rng(seed)
+    return {
+        "sources": [str(path) for path in paths],
+        "segments": len(segments),
+        "resamples": resamples,
+        "confidence": confidence,
+        "systems": system_scores(segments, resamples, confidence, rng),
+        "chapters": chapter_scores(segments),
+        "error_classes": error_class_counts(errors),
+        "pairwise": pairwise_significance(segments, resamples, confidence, rng)
+    }
+
+def format_report(report):
+    """Render a report as plain-text tables."""
+    lines = [f"{report['segments']} segments, {report['resamples']} bootstrap resamples, "
+             f"{report['confidence']:.0%} confidence intervals", ""]
+    if report["systems"]:
+        systems = pd.DataFrame([
+            {"system": system, **{key: value for key, value in summary.items() if key != "errors"}, **summary["errors"]}
+            for system, summary in report["systems"].items()
+        ]).sort_values("mean_score", ascending=False)
+        lines += [systems.to_string(index=False), ""]
+    if any(chapter["segments"] > 1 for by_file in report["chapters"].values() for chapter in by_file.values()):
+        # Segment-level results: the mean segment score of each chapter, side by side per system
+        chapters = pd.DataFrame({
+            system: {filename: chapter["mean_score"] for filename, chapter in by_file.items()}
+            for system, by_file in report["chapters"].items()
+        })
+        lines += [chapters.rename_axis("chapter").to_string(), ""]
+    if report["error_classes"]:
+        classes = pd.DataFrame([
+            {"system": system, "error_class": error_class, **counts}
+            for system, by_class in report["error_classes"].items()
+            for error_class, counts in by_class.items()
+        ]).sort_values(["system", "total"], ascending=[True, False])
+        lines += [classes.to_string(index=False), ""]
+    if report["pairwise"]:
+        lines.append(pd.DataFrame(report["pairwise"]).to_string(index=False))
+    return "\n".join(lines)
+
+def write_report(paths, output_path, resamples=1000, confidence=0.95, seed=0):
+    """Build a report, save it as JSON and return it."""
+    report = build_report(paths, resamples, confidence, seed)
+    with open(output_path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, ensure_ascii=False, indent=2)
+    return report
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Aggregate GEMBA-MQM results across chapters and systems")
+    parser.add_argument("results", type=str, nargs="+",
+                        help="gemba_results.jsonl files or <system>_evaluation_results.json files")
+    parser.add_argument("--output", type=str, default="mqm_report.json", help="Report file (default: mqm_report.json)")
+    parser.add_argument("--resamples", type=int, default=1000, help="Bootstrap resamples (default: 1000)")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level (default: 0.95)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the bootstrap resampling (default: 0)")
+    args = parser.parse_args()
+
+    report = write_report(args.results, args.output, args.resamples, args.confidence, args.seed)
+    print(format_report(report))
+    logger.info(f"Report saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
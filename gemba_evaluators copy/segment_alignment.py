@@ -0,0 +1,94 @@
+"""Split a chapter and its translation into aligned segment pairs for segment-level GEMBA-MQM.
+
+Segments are aligned by length with the Gale-Church algorithm: a translated
+segment is expected to be about as long as its source times the length ratio
+of the whole chapter, and the dynamic program finds the most probable way of
+pairing segments one to one, one to two, two to one, two to two, or with
+nothing, which marks an omission or an addition.
+"""
+import re
+import math
+# text_chunker comes from "translator_scripts copy", which gemba_evaluate.py puts on sys.path
+from text_chunker import SENTENCE_BREAK
+
+SEGMENT_LEVELS = ("paragraph", "sentence")
+
+# Prior probability of each bead, (source segments, target segments), from Gale and Church (1993)
+BEADS = {(1, 1): 0.89, (1, 0): 0.0099, (0, 1): 0.0099, (2, 1): 0.089, (1, 2): 0.089, (2, 2): 0.011}
+# Variance of the length of a translation per source character
+LENGTH_VARIANCE = 6.8
+
+# Alignments stay within this many segments of the diagonal (at least)
+MIN_BAND = 20
+
+def split_segments(text, level):
+    """Split text into paragraphs (on blank lines) or sentences."""
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', text.strip()) if p.strip()]
+    if level == "paragraph":
+        return paragraphs
+    return [
+        sentence.strip()
+        for paragraph in paragraphs
+        for sentence in SENTENCE_BREAK.split(' '.join(paragraph.split()))
+        if sentence.strip()
+    ]
+
+def _bead_cost(source_length, target_length, ratio, prior):
+    """Negative log probability of pairing segments of these total lengths."""
+    mean = (source_length + target_length / ratio) / 2
+    if mean == 0:
+        return -math.log(prior)
+    delta = (source_length * ratio - target_length) / math.sqrt(mean * LENGTH_VARIANCE)
+    # Two-sided tail probability of a standard normal deviation this large
+    probability = max(math.erfc(abs(delta) / math.sqrt(2)), 1e-300)
+    return -math.log(probability) - math.log(prior)
+
+def align_lengths(source_lengths, target_lengths):
+    """Return the most probable alignment as a list of (source indexes, target indexes) beads."""
+    n, m = len(source_lengths), len(target_lengths)
+    ratio = (sum(target_lengths) / sum(source_lengths)) if sum(source_lengths) and sum(target_lengths) else 1.0
+    band = max(MIN_BAND, abs(n - m) + 2, (n + m) // 10)
+
+    costs = [[math.inf] * (m + 1) for _ in range(n + 1)]
+    back = [[None] * (m + 1) for _ in range(n + 1)]
+    costs[0][0] = 0.0
+    for i in range(n + 1):
+        diagonal = i * m / n if n else 0
+        for j in range(max(0, int(diagonal) - band), min(m, int(diagonal) + band) + 1):
+            if i == 0 and j == 0:
+                continue
+            best, best_bead = math.inf, None
+            for (di, dj), prior in BEADS.items():
+                if di > i or dj > j or costs[i - di][j - dj] == math.inf:
+                    continue
+                cost = costs[i - di][j - dj] + _bead_cost(
+                    sum(source_lengths[i - di:i]), sum(target_lengths[j - dj:j]), ratio, prior
+                )
+                if cost < best:
+                    best, best_bead = cost, (di, dj)
+            costs[i][j], back[i][j] = best, best_bead
+
+    beads = []
+    i, j = n, m
+    while i or j:
+        di, dj = back[i][j]
+        beads.append((list(range(i - di, i)), list(range(j - dj, j))))
+        i, j = i - di, j - dj
+    return beads[::-1]
+
+def align_segments(source_text, translation_text, level="sentence"):
+    """Return aligned (source segment, translated segment) pairs; either side is "" for an omission or addition."""
+    if level not in SEGMENT_LEVELS:
+        raise ValueError(f"Unknown segment level {level!r}; use one of {', '.join(SEGMENT_LEVELS)}")
+    source_segments = split_segments(source_text, level)
+    target_segments = split_segments(translation_text, level)
+    separator = "\n\n" if level == "paragraph" else " "
+    return [
+        (
+            separator.join(source_segments[i] for i in source_indexes),
+            separator.join(target_segments[j] for j in target_indexes)
+        )
+        for source_indexes, target_indexes in align_lengths(
+            [len(segment) for segment in source_segments], [len(segment) for segment in target_segments]
+        )
+    ]
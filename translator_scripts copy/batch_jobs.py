@@ -0,0 +1,167 @@
+import json
+import asyncio
+import logging
+from pathlib import Path
+from disk_cache import hash_key, normalize_text
+from providers import add_usage, empty_usage
+from telemetry import record_request, file_telemetry
+from text_chunker import chunk_text
+from translation_engine import _check_truncated, write_atomic, save_translation, save_error, clear_error, is_translated, record_state, chunk_record, CHUNK_SEPARATOR
+from job_journal import JobJournal, IN_FLIGHT, DONE, FAILED
+
+logger = logging.getLogger(__name__)
+
+BATCH_STATE_FILE = "batch_state.json"
+
+def load_batch_state(state_path):
+    """Return the state of a batch that was submitted but not yet collected, or None."""
+    state_path = Path(state_path)
+    if not state_path.exists():
+        return None
+    with open(state_path, 'r', encoding='utf-8') as state_file:
+        return json.load(state_file)
+
+def save_batch_state(state_path, state):
+    """Write the batch state atomically so a crash cannot leave a half-written file."""
+    write_atomic(state_path, json.dumps(state, indent=2))
+
+async def wait_for_batch(provider, batch_id, poll_interval=60):
+    """Poll a batch job until the provider reports that it has finished."""
+    while True:
+        finished, counts = await provider.batch_status(batch_id)
+        logger.info(f"Batch {batch_id}: {counts}")
+        if finished:
+            return
+        await asyncio.sleep(poll_interval)
+
+def _assemble(provider, text, entry, results, cache, usage):
+    """Collect the chunks of one file and their translations from batch results and the cache."""
+    if hash_key(normalize_text(text)) != entry["source_hash"]:
+        raise Exception("Source changed after the batch was submitted; run again to translate it")
+
+    pieces = []
+    errors = []
+    chunks = chunk_text(text, entry["chunk_size"], entry.get("chunk_tokens"), provider.count_tokens)
+    for chunk, custom_id in zip(chunks, entry["chunks"]):
+        if custom_id is None:
+            translation = None
+            if cache is not None:
+                translation = cache.get_translation(chunk, provider.model, provider.system_prompt, provider.user_prompt)
+            if translation is None:
+                errors.append("A cached chunk translation was evicted before the batch finished; run again")
+            pieces.append(translation)
+            continue
+
+        response = results.get(custom_id, "missing from batch results")
+        if isinstance(response, str):
+            errors.append(f"Batch request {custom_id} failed: {response}")
+            continue
+        add_usage(usage, response.usage)
+        # Batch requests have no individual latency to report
+        record_request(usage)
+        try:
+            _check_truncated(response)
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        # Cache every good chunk, even when a sibling failed, so the rerun only pays for the failures
+        if cache is not None:
+            cache.put_translation(chunk, provider.model, provider.system_prompt, provider.user_prompt, response.text)
+        pieces.append(response.text)
+
+    if errors:
+        raise Exception("; ".join(errors))
+    return chunks, pieces
+
+async def run_batch(provider, text_entries, output_directory, force_retranslate, cache=None, chunk_size=4000, poll_interval=60, chunk_tokens=None):
+    """Translate every pending file in one provider batch job and write the usual outputs.
+
+    Chunks already in the cache are not submitted. The batch id is recorded in
+    batch_state.json, so a run that is interrupted while waiting collects the
+    same batch when it is started again instead of submitting a new one. Files
+    are recorded in the job journal as in flight from submission until their
+    translation is written.
+    """
+    output_directory = Path(output_directory)
+    journal = JobJournal(output_directory)
+    try:
+        return await _run_batch(
+            provider, text_entries, output_directory, force_retranslate, cache, chunk_size, poll_interval, chunk_tokens,
+            journal
+        )
+    finally:
+        journal.close()
+
+async def _run_batch(provider, text_entries, output_directory, force_retranslate, cache, chunk_size, poll_interval, chunk_tokens, journal):
+    state_path = output_directory / BATCH_STATE_FILE
+    state = load_batch_state(state_path)
+    if state is not None and (state["provider"], state["model"]) != (provider.name, provider.model):
+        logger.warning(f"Ignoring {state_path}: it belongs to {state['provider']} / {state['model']}")
+        state = None
+
+    if state is None:
+        state = {"provider": provider.name, "model": provider.model, "batch_id": None, "files": {}}
+        requests = {}
+        for file_number, (filename, text) in enumerate(text_entries):
+            if is_translated(journal, filename, output_directory / filename) and not force_retranslate:
+                logger.info(f"Skipping {filename} - translation already exists")
+                continue
+            custom_ids = []
+            for chunk_number, chunk in enumerate(chunk_text(text, chunk_size, chunk_tokens, provider.count_tokens)):
+                if cache is not None and cache.get_translation(
+                    chunk, provider.model, provider.system_prompt, provider.user_prompt
+                ) is not None:
+                    custom_ids.append(None)
+                    continue
+                custom_id = f"file{file_number}-chunk{chunk_number}"
+                requests[custom_id] = provider.batch_request(chunk)
+                custom_ids.append(custom_id)
+            state["files"][filename] = {
+                "source_hash": hash_key(normalize_text(text)),
+                "chunk_size": chunk_size,
+                "chunk_tokens": chunk_tokens,
+                "chunks": custom_ids
+            }
+            record_state(journal, filename, IN_FLIGHT, text)
+
+        if requests:
+            state["batch_id"] = await provider.submit_batch(requests)
+            logger.info(f"Submitted batch {state['batch_id']} with {len(requests)} requests for {len(state['files'])} files")
+        save_batch_state(state_path, state)
+    else:
+        logger.info(f"Resuming batch {state['batch_id']} for {len(state['files'])} files")
+        for filename, text in text_entries:
+            if filename in state["files"]:
+                record_state(journal, filename, IN_FLIGHT, text)
+
+    results = {}
+    if state["batch_id"]:
+        await wait_for_batch(provider, state["batch_id"], poll_interval)
+        results = await provider.batch_results(state["batch_id"])
+
+    statuses = {}
+    for filename, text in text_entries:
+        entry = state["files"].get(filename)
+        if entry is None:
+            statuses[filename] = "skipped"
+            continue
+        output_filepath = output_directory / filename
+        try:
+            usage = empty_usage()
+            chunks, pieces = _assemble(provider, text, entry, results, cache, usage)
+            save_translation(
+                output_filepath, filename, text, provider, CHUNK_SEPARATOR.join(pieces),
+                {**chunk_record(chunks, pieces), "batch_id": state["batch_id"], **file_telemetry(provider.model, usage, batch=True)}
+            )
+            record_state(journal, filename, DONE)
+            clear_error(output_directory, filename)
+            logger.info(f"Translation saved to {output_filepath}")
+            statuses[filename] = "completed"
+        except Exception as e:
+            logger.error(f"Failed to translate {filename}: {str(e)}")
+            save_error(output_directory, filename, e)
+            record_state(journal, filename, FAILED, error=str(e))
+            statuses[filename] = "failed"
+
+    state_path.unlink()
+    return [(filename, statuses[filename]) for filename, _ in text_entries]
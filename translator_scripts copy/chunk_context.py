@@ -0,0 +1,55 @@
+import re
+from text_chunker import SENTENCE_BREAK
+
+# How much of the neighbouring text is repeated as context for the next chunk
+CONTEXT_TAIL_CHARACTERS = 800
+
+CONTEXT_PROMPT = (
+    "For continuity, here is context from earlier in the same work. It is for reference only: "
+    "do not translate it or repeat it, but keep names, pronouns and terminology consistent with it.\n\n"
+)
+
+def tail(text, max_characters=CONTEXT_TAIL_CHARACTERS):
+    """Return the end of text, at most max_characters long, starting at a sentence or word boundary."""
+    text = text.strip()
+    if len(text) <= max_characters:
+        return text
+    end = text[-max_characters:]
+    sentence = SENTENCE_BREAK.search(end)
+    if sentence and sentence.end() < len(end):
+        return end[sentence.end():]
+    word = re.search(r'\s+', end)
+    if word and word.end() < len(end):
+        return end[word.end():]
+    return end
+
+def with_context(chunk, previous_source=None, earlier_translation=None):
+    """Prefix a chunk with the end of the source before it and of an earlier chunk's translation.
+
+    The result is sent in place of the chunk, so the translation cache keys on the
+    context as well and a rerun with the same context is still a cache hit.
+    """
+    if not previous_source and not earlier_translation:
+        return chunk
+    parts = [CONTEXT_PROMPT]
+    if previous_source:
+        parts.append(f"[Preceding Greek text]\n{previous_source}\n\n")
+    if earlier_translation:
+        parts.append(f"[End of an earlier part of the translation]\n{earlier_translation}\n\n")
+    parts.append(f"[Text to translate]\n{chunk}")
+    return "".join(parts)
+
+def context_for(chunks, index, window, translations):
+    """Build the text to send for chunks[index] when translating with a look-back window.
+
+    Chunk i depends on the translation of chunk i - window, so up to window
+    chunks are translated at once: window=1 is strictly sequential with the
+    tightest context, larger windows trade some context for parallelism. The
+    source tail always comes from the chunk immediately before. translations
+    maps chunk indexes to finished translations.
+    """
+    if index == 0:
+        return chunks[0]
+    earlier = index - window
+    earlier_translation = tail(translations[earlier]) if earlier >= 0 else None
+    return with_context(chunks[index], tail(chunks[index - 1]), earlier_translation)
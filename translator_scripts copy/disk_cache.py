@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIRECTORY = Path(os.getenv("BOOK_TRANSLATOR_CACHE_DIR") or (Path.home() / ".cache" / "book_translator"))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+def normalize_text(text):
+    """Normalize text so that cosmetic differences do not defeat the cache."""
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+def hash_key(*parts):
+    """Hash the given strings into a single hex cache key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+class DiskCache:
+    """A size-bounded, least-recently-used key/value store backed by SQLite.
+
+    Safe to share between threads, and between processes through SQLite's own
+    locking, so CLI runs and web workers can use the same file.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        # The total size is kept up to date by triggers, so writes do not have to sum the whole table.
+        # It is set up in one transaction so that no other process writes between the sum and the triggers.
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)"
+            )
+            self._connection.execute(
+                "INSERT OR IGNORE INTO totals (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM entries"
+            )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_inserted AFTER INSERT ON entries "
+                "BEGIN UPDATE totals SET bytes = bytes + NEW.size; END"
+            )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_deleted AFTER DELETE ON entries "
+                "BEGIN UPDATE totals SET bytes = bytes - OLD.size; END"
+            )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_resized AFTER UPDATE OF size ON entries "
+                "BEGIN UPDATE totals SET bytes = bytes - OLD.size + NEW.size; END"
+            )
+            self._connection.execute("COMMIT")
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key, value):
+        """Store `value` under `key`, evicting least recently used entries when over size."""
+        size = len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete would not fire the size trigger
+            self._connection.execute(
+                "INSERT INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "created = excluded.created, accessed = excluded.accessed",
+                (key, value, size, now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._total()
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% so that we do not evict again on the very next write
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for key, size in self._connection.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            if total <= target:
+                break
+            self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.debug(f"Evicted {evicted} entries from {self.path.name}")
+
+    def _total(self):
+        return self._connection.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+
+    def stats(self):
+        """Return hit/miss counters for this process and the current size of the store."""
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total = self._total()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": total
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+class TranslationCache(DiskCache):
+    """Translations keyed by the normalized source text, model and prompts."""
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path or (DEFAULT_CACHE_DIRECTORY / "translations.sqlite3"), max_bytes)
+
+    @staticmethod
+    def key_for(text, model, system_prompt, user_prompt):
+        return hash_key(normalize_text(text), model, system_prompt, user_prompt)
+
+    def get_translation(self, text, model, system_prompt, user_prompt):
+        return self.get(self.key_for(text, model, system_prompt, user_prompt))
+
+    def put_translation(self, text, model, system_prompt, user_prompt, translation):
+        self.put(self.key_for(text, model, system_prompt, user_prompt), translation)
+
+class EvaluationCache(DiskCache):
+    """GEMBA judge responses keyed by source, translation, prompt template and judge model.
+
+    Values are the raw judge response together with its parsed errors and score.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path or (DEFAULT_CACHE_DIRECTORY / "evaluations.sqlite3"), max_bytes)
+
+    @staticmethod
+    def key_for(source, translation, template, judge_model, source_lang, target_lang):
+        template = json.dumps(template, ensure_ascii=False, sort_keys=True)
+        return hash_key(normalize_text(source), normalize_text(translation), template, judge_model, source_lang, target_lang)
+
+    def get_evaluation(self, source, translation, template, judge_model, source_lang, target_lang):
+        value = self.get(self.key_for(source, translation, template, judge_model, source_lang, target_lang))
+        return json.loads(value) if value is not None else None
+
+    def put_evaluation(self, source, translation, template, judge_model, source_lang, target_lang, evaluation):
+        self.put(
+            self.key_for(source, translation, template, judge_model, source_lang, target_lang),
+            json.dumps(evaluation, ensure_ascii=False)
+        )
+
+class OCRCache(DiskCache):
+    """OCR text keyed by a hash of the page image pixels, the language and the Tesseract configuration."""
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(path or (DEFAULT_CACHE_DIRECTORY / "ocr.sqlite3"), max_bytes)
+
+    @staticmethod
+    def key_for(image, lang, config, engine_version=""):
+        # Hash decoded pixels rather than file bytes so the same scan matches however it was encoded
+        pixels = hashlib.sha256(image.tobytes()).hexdigest()
+        return hash_key(image.mode, image.size, pixels, lang, config, engine_version)
@@ -0,0 +1,86 @@
+import json
+import unicodedata
+
+GLOSSARY_PROMPT = "\n\nAlways translate these terms as given, wherever they occur in any inflected form:\n"
+
+def parse_glossary(text):
+    """Parse a glossary into {Greek term: [accepted English renderings]}.
+
+    Accepts a JSON object whose values are a rendering or a list of renderings,
+    or one entry per line as "term = rendering" (or tab separated), with
+    alternatives separated by "|". Blank lines and lines starting with # are
+    ignored.
+    """
+    text = text.strip()
+    if not text:
+        return {}
+    if text.startswith("{"):
+        entries = json.loads(text)
+    else:
+        entries = {}
+        for line_number, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            separator = "\t" if "\t" in line else "="
+            if separator not in line:
+                raise ValueError(f"Glossary line {line_number} is not 'term = rendering': {line!r}")
+            term, renderings = line.split(separator, 1)
+            entries[term.strip()] = renderings.split("|")
+
+    glossary = {}
+    for term, renderings in entries.items():
+        if isinstance(renderings, str):
+            renderings = [renderings]
+        renderings = [rendering.strip() for rendering in renderings if rendering.strip()]
+        if term.strip() and renderings:
+            glossary[term.strip()] = renderings
+    return glossary
+
+def load_glossary(path):
+    """Read a glossary file; see parse_glossary for the formats."""
+    with open(path, 'r', encoding='utf-8') as glossary_file:
+        return parse_glossary(glossary_file.read())
+
+def glossary_prompt(glossary):
+    """Return the instructions appended to the system prompt for a glossary, or "" for none."""
+    if not glossary:
+        return ""
+    lines = [f"- {term}: {' / '.join(renderings)}" for term, renderings in sorted(glossary.items())]
+    return GLOSSARY_PROMPT + "\n".join(lines)
+
+def apply_glossary(provider, glossary):
+    """Add the glossary to the prompts of a provider instance.
+
+    It goes into the system prompt where there is one, which keeps it in the
+    cached prompt prefix, and in front of the user prompt otherwise.
+    """
+    instructions = glossary_prompt(glossary)
+    if not instructions:
+        return
+    provider.glossary = glossary
+    if provider.system_prompt:
+        provider.system_prompt = provider.system_prompt + instructions
+    else:
+        provider.user_prompt = instructions.strip() + "\n\n" + provider.user_prompt
+
+def _fold(text):
+    # Match Greek terms regardless of accents, breathings and case
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def check_glossary(glossary, source, translation):
+    """Return the glossary entries whose term occurs in source but none of whose renderings occur in translation.
+
+    Terms match as accent-insensitive substrings, so a stem such as "Σωκρατ"
+    covers every case ending. Renderings match case-insensitively.
+    """
+    folded_source = _fold(source)
+    folded_translation = translation.casefold()
+    violations = []
+    for term, renderings in glossary.items():
+        if _fold(term) not in folded_source:
+            continue
+        if not any(rendering.casefold() in folded_translation for rendering in renderings):
+            violations.append({"term": term, "renderings": renderings})
+    return violations
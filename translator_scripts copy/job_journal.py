@@ -0,0 +1,107 @@
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from disk_cache import hash_key, normalize_text
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = ".journal.sqlite3"
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+class JobJournal:
+    """Write-ahead record of the state of every file translated into an output directory.
+
+    Each file moves from pending to in_flight before any work starts, and to done
+    only after its translation and metadata are safely on disk, or to failed. A
+    file that is still in_flight when the journal is opened was interrupted, and
+    is translated again. The journal lives in the output directory, so resuming
+    a run only needs the same --output.
+    """
+
+    def __init__(self, output_directory):
+        self.path = Path(output_directory) / JOURNAL_FILE
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # Every state change must survive a crash, not only a clean exit
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS units ("
+            "filename TEXT PRIMARY KEY, state TEXT NOT NULL, source_hash TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, updated REAL NOT NULL)"
+        )
+        interrupted = self.recover()
+        if interrupted:
+            logger.info(f"Re-queueing {interrupted} files that were interrupted in {self.path.parent}")
+
+    @staticmethod
+    def source_hash(text):
+        return hash_key(normalize_text(text))
+
+    def recover(self):
+        """Return every in-flight file to pending, since no run is working on it any more."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE units SET state = ?, updated = ? WHERE state = ?", (PENDING, time.time(), IN_FLIGHT)
+            )
+            return cursor.rowcount
+
+    def state(self, filename):
+        """Return (state, source hash) for a file, or None if the journal has never seen it."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT state, source_hash FROM units WHERE filename = ?", (filename,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def mark(self, filename, state, text=None, error=None):
+        """Record a new state for a file; starting work on it counts as an attempt."""
+        source_hash = self.source_hash(text) if text is not None else None
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO units (filename, state, source_hash, attempts, error, updated) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(filename) DO UPDATE SET state = excluded.state, "
+                "source_hash = COALESCE(excluded.source_hash, units.source_hash), "
+                "attempts = units.attempts + excluded.attempts, error = excluded.error, updated = excluded.updated",
+                (filename, state, source_hash, 1 if state == IN_FLIGHT else 0, error, time.time())
+            )
+
+    def is_done(self, filename, output_filepath):
+        """Tell whether a file has a complete translation from an earlier run.
+
+        Translations made before the journal existed count as done when both the
+        output and its .meta.json are present, since the metadata was always
+        written last.
+        """
+        entry = self.state(filename)
+        output_filepath = Path(output_filepath)
+        if entry is None:
+            if output_filepath.exists() and output_filepath.with_suffix('.meta.json').exists():
+                self.mark(filename, DONE)
+                return True
+            return False
+        return entry[0] == DONE and output_filepath.exists()
+
+    def failed(self):
+        """Return the files whose last attempt failed."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT filename FROM units WHERE state = ? ORDER BY filename", (FAILED,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def counts(self):
+        """Return the number of files in each state."""
+        with self._lock:
+            rows = self._connection.execute("SELECT state, COUNT(*) FROM units GROUP BY state").fetchall()
+        return {PENDING: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
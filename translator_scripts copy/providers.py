@@ -0,0 +1,508 @@
+import os
+import json
+import asyncio
+import inspect
+import logging
+
+from rate_limiter import AdaptiveRateLimiter
+from text_chunker import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = """You are a skilled translator from Ancient Greek to English. 
+    Focus on accuracy while maintaining readability. 
+    Preserve the meaning, tone, and style of the original text.
+    When encountering specialized terminology or cultural references, translate them accurately.
+    Do not add explanatory notes or commentary to the translation."""
+
+USER_PROMPT = "Please translate the following Ancient Greek text into English. Provide the translation only, without any additional information or commentary. Text to translate:\n\n"
+
+MAX_OUTPUT_TOKENS = 4000
+
+# The SDKs' default number of retries, kept for batch calls
+BATCH_MAX_RETRIES = 2
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens")
+
+def empty_usage():
+    return dict.fromkeys(USAGE_FIELDS, 0)
+
+def add_usage(total, usage):
+    """Add the token counts of one response to a running total."""
+    if total is None or not usage:
+        return
+    for field in USAGE_FIELDS:
+        total[field] = total.get(field, 0) + (usage.get(field) or 0)
+
+class EmptyTranslationError(Exception):
+    """Raised when a provider returns no text, e.g. because its safety filters blocked the response."""
+
+class ProviderResponse:
+    """The outcome of one translation request.
+
+    usage holds the token counts reported by the provider, including prompt
+    cache reads and writes, under the names in USAGE_FIELDS.
+    """
+
+    def __init__(self, text, headers=None, truncated=False, usage=None):
+        self.text = text
+        self.headers = headers
+        self.truncated = truncated
+        self.usage = usage
+
+async def _resolve(value):
+    # Raw responses parse synchronously in some SDK versions and asynchronously in others
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+class TranslationProvider:
+    """Common interface implemented by every model backend.
+
+    Subclasses build the SDK client lazily so that only the SDK of the provider
+    in use has to be installed. Retries, caching, chunking and metadata live in
+    translation_engine and apply to every provider alike.
+    """
+
+    name = None
+    default_model = None
+    api_key_env = None
+    system_prompt = SYSTEM_PROMPT
+    user_prompt = USER_PROMPT
+    supports_batch = False
+    # {term: [renderings]} set by glossary.apply_glossary; translations are checked against it
+    glossary = None
+
+    def __init__(self, model=None, api_key=None, limiter=None):
+        self.model = model or self.default_model
+        self.api_key = api_key or os.getenv(self.api_key_env)
+        if not self.api_key:
+            raise ValueError(f"No API key provided. Set {self.api_key_env} environment variable or provide it as an argument.")
+        # Each provider paces itself independently so providers can run side by side
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self.create_client()
+        return self._client
+
+    @property
+    def batch_client(self):
+        """The client with the SDK's own retries, for batch calls, which do not go through the rate limiter."""
+        return self.client.with_options(max_retries=BATCH_MAX_RETRIES)
+
+    def create_client(self):
+        raise NotImplementedError
+
+    def user_content(self, text):
+        return f"{self.user_prompt}{text}"
+
+    def count_tokens(self, text):
+        """Return the number of input tokens text takes up, used for chunking and pacing."""
+        return estimate_tokens(text)
+
+    async def complete(self, text):
+        """Translate text in a single request and return a ProviderResponse."""
+        raise NotImplementedError
+
+    async def stream(self, text, on_text):
+        """Translate text with the provider's streaming API, calling on_text for each delta."""
+        raise NotImplementedError
+
+    def batch_request(self, text):
+        """Return the request body used for text in a batch job."""
+        return self.request_params(text)
+
+    async def submit_batch(self, requests):
+        """Submit {custom_id: request body} as one batch job and return the batch id."""
+        raise NotImplementedError(f"{self.name} does not support batch jobs")
+
+    async def batch_status(self, batch_id):
+        """Return (finished, request counts) for a submitted batch job."""
+        raise NotImplementedError(f"{self.name} does not support batch jobs")
+
+    async def batch_results(self, batch_id):
+        """Return {custom_id: ProviderResponse, or an error message} for a finished batch job."""
+        raise NotImplementedError(f"{self.name} does not support batch jobs")
+
+    def classify_error(self, error):
+        """Return "rate_limited", "overloaded" or "retryable" for transient errors, None otherwise."""
+        return None
+
+    @staticmethod
+    def error_headers(error):
+        return getattr(getattr(error, "response", None), "headers", None)
+
+class ClaudeProvider(TranslationProvider):
+    name = "claude"
+    default_model = "claude-3-7-sonnet-latest"
+    api_key_env = "ANTHROPIC_API_KEY"
+    supports_batch = True
+
+    def create_client(self):
+        from anthropic import AsyncAnthropic
+        # Retries go through _handle_api_error, so the shared rate limiter sees every 429
+        return AsyncAnthropic(api_key=self.api_key, max_retries=0)
+
+    @staticmethod
+    def messages_params(model, system_prompt, user_content):
+        """Messages API parameters for one translation; translator_claude's synchronous calls use them too."""
+        return {
+            "model": model,
+            "max_tokens": MAX_OUTPUT_TOKENS,
+            # The system prompt is identical on every request, so mark it as a prompt cache breakpoint
+            "system": [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ],
+            "messages": [
+                {"role": "user", "content": user_content}
+            ]
+        }
+
+    def request_params(self, text):
+        return self.messages_params(self.model, self.system_prompt, self.user_content(text))
+
+    @staticmethod
+    def usage_of(message):
+        usage = message.usage
+        return {
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "cache_read_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+            "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0
+        }
+
+    async def complete(self, text):
+        raw_response = await self.client.messages.with_raw_response.create(**self.request_params(text))
+        response = await _resolve(raw_response.parse())
+        return ProviderResponse(
+            response.content[0].text,
+            headers=raw_response.headers,
+            truncated=response.stop_reason == "max_tokens",
+            usage=self.usage_of(response)
+        )
+
+    async def stream(self, text, on_text):
+        parts = []
+        async with self.client.messages.stream(**self.request_params(text)) as stream:
+            async for delta in stream.text_stream:
+                parts.append(delta)
+                on_text(delta)
+            message = await stream.get_final_message()
+        return ProviderResponse(
+            ''.join(parts), truncated=message.stop_reason == "max_tokens", usage=self.usage_of(message)
+        )
+
+    async def submit_batch(self, requests):
+        batch = await self.batch_client.messages.batches.create(
+            requests=[{"custom_id": custom_id, "params": params} for custom_id, params in requests.items()]
+        )
+        return batch.id
+
+    async def batch_status(self, batch_id):
+        batch = await self.batch_client.messages.batches.retrieve(batch_id)
+        return batch.processing_status == "ended", batch.request_counts.to_dict()
+
+    async def batch_results(self, batch_id):
+        results = {}
+        async for entry in await self.batch_client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                message = entry.result.message
+                results[entry.custom_id] = ProviderResponse(
+                    message.content[0].text, truncated=message.stop_reason == "max_tokens", usage=self.usage_of(message)
+                )
+            else:
+                # errored, canceled or expired
+                error = getattr(entry.result, "error", None)
+                results[entry.custom_id] = f"{entry.result.type}: {error}" if error else entry.result.type
+        return results
+
+    def classify_error(self, error):
+        from anthropic import APIStatusError, APIConnectionError, RateLimitError
+        if isinstance(error, RateLimitError):
+            return "rate_limited"
+        if isinstance(error, APIStatusError) and error.status_code == 529:
+            return "overloaded"
+        if isinstance(error, APIConnectionError) or (isinstance(error, APIStatusError) and error.status_code >= 500):
+            return "retryable"
+        return None
+
+class OpenAIProvider(TranslationProvider):
+    name = "gpt4o"
+    default_model = "gpt-4o"
+    api_key_env = "OPENAI_API_KEY"
+    supports_batch = True
+    batch_endpoint = "/v1/chat/completions"
+    system_prompt = "You are a skilled translator from Ancient Greek to English."
+    user_prompt = "Translate the following Ancient Greek text to English:\n\n"
+
+    _encoding = None
+
+    def create_client(self):
+        from openai import AsyncOpenAI
+        # Retries go through _handle_api_error, so the shared rate limiter sees every 429
+        return AsyncOpenAI(api_key=self.api_key, max_retries=0)
+
+    def count_tokens(self, text):
+        """Count tokens exactly with tiktoken when it is installed, otherwise estimate them."""
+        if self._encoding is None:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.encoding_for_model(self.model)
+            except (ImportError, KeyError):
+                self._encoding = False
+        if self._encoding is False:
+            return estimate_tokens(text)
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def request_params(self, text):
+        return {
+            "model": self.model,
+            "max_tokens": MAX_OUTPUT_TOKENS,
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": self.user_content(text)}
+            ]
+        }
+
+    @staticmethod
+    def usage_of(usage):
+        """Convert an OpenAI usage object or dict; OpenAI caches prompt prefixes automatically and reports reads only."""
+        if usage is None:
+            return None
+        if not isinstance(usage, dict):
+            usage = usage.to_dict()
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        return {
+            # prompt_tokens includes the cached ones; count uncached input only, as Anthropic does
+            "input_tokens": (usage.get("prompt_tokens") or 0) - cached,
+            "output_tokens": usage.get("completion_tokens") or 0,
+            "cache_read_tokens": cached,
+            "cache_write_tokens": 0
+        }
+
+    async def complete(self, text):
+        raw_response = await self.client.chat.completions.with_raw_response.create(**self.request_params(text))
+        response = await _resolve(raw_response.parse())
+        choice = response.choices[0]
+        return ProviderResponse(
+            choice.message.content.strip(),
+            headers=raw_response.headers,
+            truncated=choice.finish_reason == "length",
+            usage=self.usage_of(response.usage)
+        )
+
+    async def stream(self, text, on_text):
+        parts = []
+        finish_reason = None
+        usage = None
+        stream = await self.client.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **self.request_params(text)
+        )
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = self.usage_of(chunk.usage)
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                parts.append(choice.delta.content)
+                on_text(choice.delta.content)
+            finish_reason = choice.finish_reason or finish_reason
+        return ProviderResponse(''.join(parts), truncated=finish_reason == "length", usage=usage)
+
+    async def submit_batch(self, requests):
+        lines = [
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": self.batch_endpoint, "body": body}, ensure_ascii=False)
+            for custom_id, body in requests.items()
+        ]
+        batch_file = await self.batch_client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch"
+        )
+        batch = await self.batch_client.batches.create(
+            input_file_id=batch_file.id, endpoint=self.batch_endpoint, completion_window="24h"
+        )
+        return batch.id
+
+    async def batch_status(self, batch_id):
+        batch = await self.batch_client.batches.retrieve(batch_id)
+        counts = batch.request_counts.to_dict() if batch.request_counts else {}
+        return batch.status in ("completed", "failed", "expired", "cancelled"), {"status": batch.status, **counts}
+
+    async def batch_results(self, batch_id):
+        batch = await self.batch_client.batches.retrieve(batch_id)
+        results = {}
+        # Successful requests land in the output file, failed ones in the error file
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.batch_client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") == 200:
+                    choice = response["body"]["choices"][0]
+                    results[entry["custom_id"]] = ProviderResponse(
+                        choice["message"]["content"].strip(),
+                        truncated=choice["finish_reason"] == "length",
+                        usage=self.usage_of(response["body"].get("usage"))
+                    )
+                else:
+                    results[entry["custom_id"]] = str(entry.get("error") or response.get("body"))
+        return results
+
+    def classify_error(self, error):
+        from openai import APIStatusError, APIConnectionError, RateLimitError
+        if isinstance(error, RateLimitError):
+            return "rate_limited"
+        if isinstance(error, APIStatusError) and error.status_code == 503:
+            return "overloaded"
+        if isinstance(error, APIConnectionError) or (isinstance(error, APIStatusError) and error.status_code >= 500):
+            return "retryable"
+        return None
+
+class GeminiProvider(TranslationProvider):
+    name = "gemini"
+    default_model = "gemini-1.5-pro"
+    api_key_env = "GOOGLE_API_KEY"
+    system_prompt = ""
+    user_prompt = "Please translate the following Ancient Greek text into English. Provide the translation only, without any additional information or commentary. Text to translate:\n"
+    # The SDK has no asynchronous REST transport, so REST requests run in a thread
+    rest = False
+
+    def create_client(self):
+        import google.generativeai as genai
+        base_url = os.getenv("GEMINI_BASE_URL")
+        if base_url:
+            # Stand-in servers such as benchmarks/mock_llm_server.py speak the REST API only
+            genai.configure(api_key=self.api_key, transport="rest", client_options={"api_endpoint": base_url})
+            self.rest = True
+        else:
+            genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel(
+            self.model,
+            generation_config={"max_output_tokens": MAX_OUTPUT_TOKENS}
+        )
+
+    @staticmethod
+    def _truncated(response):
+        candidates = getattr(response, "candidates", None) or []
+        return bool(candidates) and getattr(candidates[0].finish_reason, "name", None) == "MAX_TOKENS"
+
+    # Finish reasons for which the filters withheld the output
+    BLOCKED_FINISH_REASONS = {"SAFETY", "RECITATION", "BLOCKLIST", "PROHIBITED_CONTENT", "SPII"}
+
+    @staticmethod
+    def _check_prompt(response):
+        block_reason = getattr(getattr(response, "prompt_feedback", None), "block_reason", None)
+        if block_reason:
+            raise EmptyTranslationError(
+                f"Gemini returned no content: the prompt was blocked ({getattr(block_reason, 'name', block_reason)})"
+            )
+
+    @classmethod
+    def _text_of(cls, response):
+        """Text of the first candidate.
+
+        response.parts and response.text raise ValueError when the filters block
+        the prompt or the candidate, so the block and finish reasons are checked
+        before the parts are read.
+        """
+        cls._check_prompt(response)
+        candidates = getattr(response, "candidates", None) or []
+        if not candidates:
+            return ""
+        finish_reason = getattr(candidates[0].finish_reason, "name", None)
+        if finish_reason in cls.BLOCKED_FINISH_REASONS:
+            raise EmptyTranslationError(f"Gemini withheld the response: finish reason {finish_reason}")
+        return '\n'.join(part.text for part in candidates[0].content.parts if "text" in part)
+
+    @staticmethod
+    def _check_empty(response, text):
+        if text:
+            return
+        candidates = getattr(response, "candidates", None) or []
+        if candidates:
+            reason = f"finish reason {getattr(candidates[0].finish_reason, 'name', candidates[0].finish_reason)}"
+        else:
+            reason = "no candidates"
+        raise EmptyTranslationError(f"Gemini returned no content: {reason}")
+
+    @staticmethod
+    def usage_of(response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return None
+        cached = getattr(usage, "cached_content_token_count", 0) or 0
+        return {
+            "input_tokens": (getattr(usage, "prompt_token_count", 0) or 0) - cached,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+            "cache_read_tokens": cached,
+            "cache_write_tokens": 0
+        }
+
+    async def complete(self, text):
+        client = self.client
+        if self.rest:
+            response = await asyncio.to_thread(client.generate_content, self.user_content(text))
+        else:
+            response = await client.generate_content_async(self.user_content(text))
+        text = self._text_of(response)
+        self._check_empty(response, text)
+        return ProviderResponse(text, truncated=self._truncated(response), usage=self.usage_of(response))
+
+    async def stream(self, text, on_text):
+        parts = []
+        client = self.client
+        if self.rest:
+            loop = asyncio.get_running_loop()
+
+            def generate():
+                response = client.generate_content(self.user_content(text), stream=True)
+                self._check_prompt(response)
+                for chunk in response:
+                    chunk_text = self._text_of(chunk)
+                    if chunk_text:
+                        parts.append(chunk_text)
+                        loop.call_soon_threadsafe(on_text, chunk_text)
+                return response
+
+            response = await asyncio.to_thread(generate)
+            self._check_empty(response, ''.join(parts))
+            return ProviderResponse(''.join(parts), truncated=self._truncated(response), usage=self.usage_of(response))
+
+        response = await client.generate_content_async(self.user_content(text), stream=True)
+        self._check_prompt(response)
+        async for chunk in response:
+            chunk_text = self._text_of(chunk)
+            if chunk_text:
+                parts.append(chunk_text)
+                on_text(chunk_text)
+        self._check_empty(response, ''.join(parts))
+        return ProviderResponse(''.join(parts), truncated=self._truncated(response), usage=self.usage_of(response))
+
+    def classify_error(self, error):
+        from google.api_core import exceptions
+        # The REST transport reports a 429 as TooManyRequests rather than ResourceExhausted
+        if isinstance(error, (exceptions.ResourceExhausted, exceptions.TooManyRequests)):
+            return "rate_limited"
+        if isinstance(error, exceptions.ServiceUnavailable):
+            return "overloaded"
+        if isinstance(error, (exceptions.InternalServerError, exceptions.DeadlineExceeded)):
+            return "retryable"
+        return None
+
+PROVIDERS = {
+    provider.name: provider
+    for provider in (ClaudeProvider, GeminiProvider, OpenAIProvider)
+}
+
+def create_provider(name, model=None, api_key=None, limiter=None):
+    """Instantiate the provider registered under `name`."""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown provider {name!r}. Choose from: {', '.join(PROVIDERS)}")
+    return PROVIDERS[name](model=model, api_key=api_key, limiter=limiter)
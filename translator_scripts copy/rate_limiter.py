@@ -0,0 +1,199 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from text_chunker import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+def _parse_reset(value, now):
+    """Convert a rate-limit reset header into seconds from now.
+
+    Anthropic sends RFC 3339 timestamps, OpenAI sends durations such as "1s" or "6m0s",
+    and retry-after is a plain number of seconds.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return max(0.0, reset_at.timestamp() - now)
+    except ValueError:
+        pass
+    seconds = 0.0
+    number = ""
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0}
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char.isdigit() or char == ".":
+            number += char
+        elif value.startswith("ms", i) and number:
+            seconds += float(number) / 1000.0
+            number = ""
+            i += 1
+        elif char in units and number:
+            seconds += float(number) * units[char]
+            number = ""
+        else:
+            return None
+        i += 1
+    return seconds
+
+def _header(headers, *names):
+    """Return the first header from `names` that is present, or None."""
+    if headers is None:
+        return None
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+class TokenBucket:
+    """A refilling bucket measured in units per minute.
+
+    Reservations may drive the level negative; the caller then waits until the
+    debt is repaid, which keeps concurrent callers in arrival order.
+    """
+
+    def __init__(self, per_minute):
+        self.per_minute = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.level = min(self.per_minute, self.level + elapsed * self.per_minute / 60.0)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        """Take `amount` units and return how many seconds the caller must wait."""
+        self._refill(now)
+        self.level -= amount
+        if self.level >= 0:
+            return 0.0
+        return -self.level * 60.0 / self.per_minute
+
+    def set_rate(self, per_minute, now):
+        self._refill(now)
+        self.per_minute = float(per_minute)
+        self.level = min(self.level, self.per_minute)
+
+    def clamp(self, remaining, now):
+        """Lower the level to what the provider reports as remaining."""
+        self._refill(now)
+        self.level = min(self.level, float(remaining))
+
+class AdaptiveRateLimiter:
+    """Paces requests for one provider across all concurrent workers.
+
+    Every request reserves one request and its estimated tokens from the
+    requests-per-minute and tokens-per-minute buckets before it is sent.
+    Concurrency grows additively while requests succeed within the target
+    latency and is halved on every 429, which also pauses all workers until the
+    provider's retry-after has passed instead of each worker backing off alone.
+    """
+
+    def __init__(self, requests_per_minute=50, tokens_per_minute=40000, max_concurrency=8,
+                 min_concurrency=1, target_latency=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency = target_latency
+        self.concurrency = float(max_concurrency)
+        self.paused_until = 0.0
+        self.rate_limited_count = 0
+        self._in_flight = 0
+        self._condition = None
+
+    @property
+    def limit(self):
+        return max(self.min_concurrency, int(self.concurrency))
+
+    def _get_condition(self):
+        # Created lazily so the limiter can be built before the event loop starts
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self, estimated_tokens=1):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+        now = time.monotonic()
+        wait_time = max(
+            self.paused_until - now,
+            self.requests.reserve(1, now),
+            self.tokens.reserve(min(estimated_tokens, self.tokens.per_minute), now),
+        )
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self._in_flight -= 1
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens=1):
+        """Hold a concurrency slot for the duration of one request."""
+        await self.acquire(estimated_tokens)
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def record_success(self, latency, headers=None):
+        """Grow concurrency after a successful request and sync with rate-limit headers."""
+        self.update_from_headers(headers)
+        if self.target_latency is not None and latency > self.target_latency:
+            self.concurrency = max(self.min_concurrency, self.concurrency - 1)
+        else:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / self.limit)
+
+    def record_rate_limited(self, headers=None, default_wait=2.0):
+        """Halve concurrency and pause every worker; returns the pause in seconds."""
+        now = time.monotonic()
+        self.rate_limited_count += 1
+        self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+        self.update_from_headers(headers)
+
+        wait_time = _parse_reset(_header(headers, "retry-after"), time.time())
+        if wait_time is None:
+            wait_time = default_wait
+        self.paused_until = max(self.paused_until, now + wait_time)
+        logger.debug(f"Concurrency reduced to {self.limit} after rate limit")
+        return wait_time
+
+    def update_from_headers(self, headers):
+        """Adopt the limits and remaining budget reported by Anthropic or OpenAI headers."""
+        if headers is None:
+            return
+        now = time.monotonic()
+
+        request_limit = _header(headers, "anthropic-ratelimit-requests-limit", "x-ratelimit-limit-requests")
+        if request_limit is not None:
+            self.requests.set_rate(float(request_limit), now)
+        token_limit = _header(headers, "anthropic-ratelimit-input-tokens-limit",
+                              "anthropic-ratelimit-tokens-limit", "x-ratelimit-limit-tokens")
+        if token_limit is not None:
+            self.tokens.set_rate(float(token_limit), now)
+
+        remaining_requests = _header(headers, "anthropic-ratelimit-requests-remaining",
+                                     "x-ratelimit-remaining-requests")
+        if remaining_requests is not None:
+            self.requests.clamp(float(remaining_requests), now)
+        remaining_tokens = _header(headers, "anthropic-ratelimit-input-tokens-remaining",
+                                   "anthropic-ratelimit-tokens-remaining", "x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            self.tokens.clamp(float(remaining_tokens), now)
@@ -0,0 +1,109 @@
+import math
+from providers import USAGE_FIELDS
+
+# List prices in USD per million tokens: (input, output, cache read, cache write).
+# Models match by prefix, so dated and -latest names share an entry. Edit these to
+# match your own pricing; models that are not listed get no cost estimate.
+PRICES = {
+    "claude-3-7-sonnet": (3.00, 15.00, 0.30, 3.75),
+    "claude-3-5-sonnet": (3.00, 15.00, 0.30, 3.75),
+    "claude-3-5-haiku": (0.80, 4.00, 0.08, 1.00),
+    "claude-3-opus": (15.00, 75.00, 1.50, 18.75),
+    "gpt-4o-mini": (0.15, 0.60, 0.075, 0.0),
+    "gpt-4o": (2.50, 10.00, 1.25, 0.0),
+    "gemini-1.5-flash": (0.075, 0.30, 0.01875, 0.0),
+    "gemini-1.5-pro": (1.25, 5.00, 0.3125, 0.0),
+}
+# Batch jobs are billed at half the interactive price by Anthropic and OpenAI
+BATCH_DISCOUNT = 0.5
+
+TELEMETRY_FIELDS = ("requests", "retries")
+TIMING_FIELDS = ("latency_seconds", "first_token_seconds")
+
+def record_request(usage, latency=None, first_token=None):
+    """Count one successful API request, with its duration and time to first token when known."""
+    if usage is None:
+        return
+    usage["requests"] = usage.get("requests", 0) + 1
+    if latency is not None:
+        usage.setdefault("latency_seconds", []).append(round(latency, 3))
+    if first_token is not None:
+        usage.setdefault("first_token_seconds", []).append(round(first_token, 3))
+
+def record_retry(usage):
+    """Count one failed attempt that is about to be retried."""
+    if usage is not None:
+        usage["retries"] = usage.get("retries", 0) + 1
+
+def price_for(model):
+    """Return the PRICES entry for model, preferring the longest matching prefix."""
+    matches = [prefix for prefix in PRICES if model and model.startswith(prefix)]
+    return PRICES[max(matches, key=len)] if matches else None
+
+def cost_of(model, usage, batch=False):
+    """Estimate the cost in USD of the tokens in usage, or None for a model without prices.
+
+    input_tokens counts uncached input only, as every provider reports it here.
+    """
+    prices = price_for(model)
+    if prices is None or usage is None:
+        return None
+    cost = sum(
+        (usage.get(field) or 0) * price
+        for field, price in zip(USAGE_FIELDS, prices)
+    ) / 1_000_000
+    return round(cost * (BATCH_DISCOUNT if batch else 1.0), 6)
+
+def file_telemetry(model, usage, wall_time=None, batch=False):
+    """Split a usage accumulator into the "usage" and "telemetry" entries of a .meta.json."""
+    return {
+        "usage": {field: usage.get(field, 0) for field in USAGE_FIELDS},
+        "telemetry": {
+            **{field: usage.get(field, 0) for field in TELEMETRY_FIELDS},
+            **{field: usage.get(field, []) for field in TIMING_FIELDS},
+            "wall_time_seconds": round(wall_time, 3) if wall_time is not None else None,
+            "batch": batch,
+            "cost_usd": cost_of(model, usage, batch)
+        }
+    }
+
+def percentile(values, fraction):
+    """Return the value below which the given fraction of values fall (nearest rank), or None."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def summarize_telemetry(metadata_entries, wall_time=None):
+    """Aggregate the usage and telemetry of several .meta.json entries for a run summary."""
+    usage = dict.fromkeys(USAGE_FIELDS, 0)
+    totals = dict.fromkeys(TELEMETRY_FIELDS, 0)
+    timings = {field: [] for field in TIMING_FIELDS}
+    cost = 0.0
+    priced = True
+    for metadata in metadata_entries:
+        for field in USAGE_FIELDS:
+            usage[field] += (metadata.get("usage") or {}).get(field, 0)
+        telemetry = metadata.get("telemetry") or {}
+        for field in TELEMETRY_FIELDS:
+            totals[field] += telemetry.get(field, 0)
+        for field in TIMING_FIELDS:
+            timings[field].extend(telemetry.get(field, []))
+        if telemetry.get("cost_usd") is None:
+            priced = False
+        else:
+            cost += telemetry["cost_usd"]
+
+    request_time = sum(timings["latency_seconds"])
+    return {
+        **usage,
+        **totals,
+        "latency_p50_seconds": percentile(timings["latency_seconds"], 0.50),
+        "latency_p95_seconds": percentile(timings["latency_seconds"], 0.95),
+        "first_token_p50_seconds": percentile(timings["first_token_seconds"], 0.50),
+        "first_token_p95_seconds": percentile(timings["first_token_seconds"], 0.95),
+        # Generation speed of a single request, and throughput of the whole run
+        "output_tokens_per_request_second": round(usage["output_tokens"] / request_time, 2) if request_time else None,
+        "output_tokens_per_second": round(usage["output_tokens"] / wall_time, 2) if wall_time else None,
+        "cost_usd": round(cost, 6) if priced else None
+    }
@@ -0,0 +1,150 @@
+r"""Split source text into chunks that fit a model's input budget.
+
+Sentences end at Western punctuation and at the Greek question mark and ano teleia
+(check with python -m doctest text_chunker.py):
+
+>>> SENTENCE_BREAK.split('a\u0387 b\u037e c. d') == ['a\u0387', 'b\u037e', 'c.', 'd']
+True
+"""
+import re
+import math
+
+# Whitespace after the end of a sentence, including the Greek question mark (U+037E) and ano teleia (U+0387).
+# They are escaped because editors and Unicode normalization turn them into ; and U+00B7.
+SENTENCE_BREAK = re.compile(r'(?<=[.!?;\u037e\u0387])\s+')
+
+# Progressively finer places to break a paragraph that does not fit in one chunk:
+# line breaks, then sentence ends, then clause punctuation, then any whitespace.
+# Each pattern comes with the separator that puts the pieces back together.
+SPLIT_PATTERNS = [
+    (re.compile(r'(?<=\n)'), ""),
+    (SENTENCE_BREAK, " "),
+    (re.compile(r'(?<=[,:—])\s+'), " "),
+    (re.compile(r'(?<=\s)'), ""),
+]
+
+# Approximate tokens per character by script for the Claude and GPT tokenizers,
+# erring high so that chunks stay within budget. Latin text packs about four
+# characters into a token, but the byte-level tokenizers have few merges for Greek:
+# monotonic Greek takes most of a token per letter, and polytonic letters and
+# combining accents more than one. Whitespace mostly merges into the following
+# word; any other character counts as a full token.
+TOKEN_RATES = [
+    (re.compile(r'[A-Za-z0-9]+'), 0.25),
+    (re.compile(r'[\u0370-\u03ff]+'), 0.8),
+    (re.compile(r'[\u1f00-\u1fff\u0300-\u036f]+'), 1.2),
+    (re.compile(r'\s+'), 0.0),
+]
+
+def estimate_tokens(text):
+    """Fast token estimate that accounts for the script of the text."""
+    tokens = 0.0
+    counted = 0
+    for pattern, rate in TOKEN_RATES:
+        characters = sum(len(match) for match in pattern.findall(text))
+        tokens += characters * rate
+        counted += characters
+    return max(1, math.ceil(tokens + len(text) - counted))
+
+def _pack(pieces, limit, separator, measure):
+    """Greedily join pieces into chunks whose measured size is at most limit."""
+    chunks = []
+    current_chunk = ""
+    current_size = 0
+    separator_size = measure(separator) if separator else 0
+    for piece in pieces:
+        piece_size = measure(piece)
+        if current_chunk and current_size + separator_size + piece_size > limit:
+            chunks.append(current_chunk)
+            current_chunk, current_size = piece, piece_size
+        elif current_chunk:
+            current_chunk += separator + piece
+            current_size += separator_size + piece_size
+        else:
+            current_chunk, current_size = piece, piece_size
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+def _cut(text, limit, measure):
+    """Cut text with no natural break into the longest pieces that fit the limit."""
+    pieces = []
+    while text:
+        low, high = 1, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if measure(text[:middle]) <= limit:
+                low = middle
+            else:
+                high = middle - 1
+        pieces.append(text[:low])
+        text = text[low:]
+    return pieces
+
+def split_oversized(text, limit, measure=len, level=0):
+    """Split a single paragraph whose measured size is larger than limit."""
+    if measure(text) <= limit:
+        return [text]
+    if level == len(SPLIT_PATTERNS):
+        # No natural break left, cut at the size limit
+        return _cut(text, limit, measure)
+
+    pattern, separator = SPLIT_PATTERNS[level]
+    pieces = [p for p in pattern.split(text) if p]
+    parts = []
+    for piece in pieces:
+        parts.extend(split_oversized(piece, limit, measure, level + 1))
+    return [part.strip() for part in _pack(parts, limit, separator, measure) if part.strip()]
+
+def _known_run(paragraphs, start, limit, measure, known):
+    """End of the longest run of paragraphs from start that fits the limit and forms a known chunk, or None."""
+    end = None
+    chunk = paragraphs[start]
+    for stop in range(start + 1, len(paragraphs) + 1):
+        if stop > start + 1:
+            chunk += '\n\n' + paragraphs[stop - 1]
+        if measure(chunk) > limit:
+            break
+        if known(chunk):
+            end = stop
+    return end
+
+def chunk_text(text, max_chunk_size=4000, max_tokens=None, count_tokens=estimate_tokens, known=None):
+    """Split text into chunks of appropriate size for the API.
+
+    Paragraphs are packed together up to max_chunk_size characters, or up to
+    max_tokens tokens as counted by count_tokens when max_tokens is given.
+    Paragraphs that are larger on their own are broken on lines, sentences,
+    clauses or words so that no chunk exceeds the limit. Packing is greedy, which
+    gives the fewest chunks for the limit.
+
+    known, when given, tells whether a chunk was translated before. Runs of
+    paragraphs that form a known chunk are kept as that chunk and only the text
+    between them is packed, so an edit changes the chunks around it instead of
+    shifting every chunk boundary after it.
+    """
+    if max_tokens is not None:
+        limit, measure = max_tokens, count_tokens
+    else:
+        limit, measure = max_chunk_size, len
+
+    paragraphs = []
+    for paragraph in text.split('\n\n'):
+        paragraphs.extend(split_oversized(paragraph, limit, measure))
+    if known is None:
+        return _pack(paragraphs, limit, '\n\n', measure)
+
+    chunks = []
+    pending = []
+    start = 0
+    while start < len(paragraphs):
+        end = _known_run(paragraphs, start, limit, measure, known)
+        if end is None:
+            pending.append(paragraphs[start])
+            start += 1
+            continue
+        chunks += _pack(pending, limit, '\n\n', measure)
+        chunks.append('\n\n'.join(paragraphs[start:end]))
+        pending = []
+        start = end
+    return chunks + _pack(pending, limit, '\n\n', measure)
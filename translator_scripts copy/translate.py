@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from datetime import datetime
+from dotenv import load_dotenv
+from providers import PROVIDERS, create_provider
+from rate_limiter import AdaptiveRateLimiter
+from disk_cache import TranslationCache
+from translation_engine import load_texts_from_directory, run_translations, write_summary, failed_files
+from batch_jobs import run_batch
+from glossary import load_glossary, apply_glossary
+
+# Load environment variables from .env file if it exists
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+def configure_logging(provider_name):
+    """Log to the console and to translator_<provider>.log."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(f"translator_{provider_name}.log"),
+            logging.StreamHandler()
+        ]
+    )
+
+def build_parser(default_provider=None):
+    parser = argparse.ArgumentParser(description="Translate Ancient Greek texts using Claude, Gemini or GPT-4o")
+    parser.add_argument("--provider", type=str, nargs="+", choices=sorted(PROVIDERS) + ["all"],
+                        default=[default_provider or "claude"],
+                        help="Model provider(s) to translate with; several providers (or 'all') translate "
+                             "every chapter with each of them concurrently (default: %(default)s)")
+    parser.add_argument("--source", type=str, help="Source directory containing Greek text files")
+    parser.add_argument("--output", type=str, help="Output directory for translations")
+    parser.add_argument("--model", type=str, nargs="+",
+                        help="Model to use for translation (default: the provider's default model); "
+                             "with several providers, give provider=model pairs")
+    parser.add_argument("--api-key", type=str,
+                        help="API key for the provider (optional, can use env var; single provider only)")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Maximum number of concurrent API requests (default: 8)")
+    parser.add_argument("--requests-per-minute", type=int, default=50,
+                        help="Requests-per-minute quota to pace against (default: 50)")
+    parser.add_argument("--tokens-per-minute", type=int, default=40000,
+                        help="Input tokens-per-minute quota to pace against (default: 40000)")
+    parser.add_argument("--target-latency", type=float,
+                        help="Shrink concurrency when requests take longer than this many seconds")
+    parser.add_argument("--force", action="store_true",
+                        help="Force retranslation of already translated files")
+    parser.add_argument("--chunk-tokens", type=int, default=3000,
+                        help="Split files into concurrently translated chunks of up to this many input tokens (default: 3000)")
+    parser.add_argument("--chunk-size", type=int,
+                        help="Measure chunks in characters instead, splitting files longer than this many characters")
+    parser.add_argument("--context-window", type=int, default=0,
+                        help="Send each chunk with the end of the preceding source and of the translation of the chunk "
+                             "this many places earlier, translating that many chunks at a time (default: 0, no context)")
+    parser.add_argument("--glossary", type=str,
+                        help="Glossary file of 'term = rendering' lines or a JSON object; terms are added to the prompt "
+                             "and translations are checked against them")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Re-translate only the chunks whose source changed since the last run")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit all pending work as a provider batch job and wait for it (Claude and GPT-4o only)")
+    parser.add_argument("--poll-interval", type=float, default=60,
+                        help="Seconds between batch status checks (default: 60)")
+    parser.add_argument("--cache-path", type=str,
+                        help="SQLite translation cache file (default: ~/.cache/book_translator/translations.sqlite3)")
+    parser.add_argument("--cache-max-mb", type=int, default=512,
+                        help="Evict least recently used cache entries beyond this size (default: 512)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the translation cache")
+    parser.add_argument("--files", type=str, nargs="+",
+                        help="Specific files to translate (optional)")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Translate only the files whose last attempt failed, as listed under errors/ "
+                             "in the output directory")
+    return parser
+
+def parse_models(model_args, provider_names):
+    """Map provider names to the --model values that apply to them."""
+    models = {}
+    for value in model_args or []:
+        if "=" in value:
+            name, model = value.split("=", 1)
+            models[name] = model
+        elif len(provider_names) == 1:
+            models[provider_names[0]] = value
+        else:
+            raise ValueError(f"Use provider=model to choose a model when translating with several providers, got {value!r}")
+    return models
+
+def resolve_output_directory(args, provider_name, fan_out):
+    """Return the output directory for one provider, as a string."""
+    # Get the repository root
+    script_dir = Path(__file__).parent.parent.absolute()
+    explicit_output = args.output or os.getenv("OUTPUT_DIRECTORY")
+
+    if explicit_output is None:
+        # Add timestamp to output directory if not specified
+        timestamp = datetime.now().strftime("%m.%d.%y")
+        return str(script_dir / f"Translations/{provider_name}_translations_{timestamp}")
+    if fan_out:
+        return str(Path(explicit_output) / f"{provider_name}_translations")
+    return str(explicit_output)
+
+async def run_fan_out(jobs, text_entries, force_retranslate, cache, incremental, chunk_size, batch=False, poll_interval=60, chunk_tokens=None, context_window=None):
+    """Translate every chapter with every provider at once; returns results and wall time per provider."""
+    async def run_one(position, provider, output_directory):
+        start_time = time.monotonic()
+        if batch and provider.supports_batch:
+            results = await run_batch(
+                provider, text_entries, output_directory, force_retranslate, cache, chunk_size, poll_interval, chunk_tokens
+            )
+        else:
+            results = await run_translations(
+                provider, text_entries, output_directory, force_retranslate, cache, incremental, chunk_size,
+                position=position, chunk_tokens=chunk_tokens, context_window=context_window
+            )
+        return results, time.monotonic() - start_time
+
+    return await asyncio.gather(*(
+        run_one(position, provider, output_directory)
+        for position, (provider, output_directory) in enumerate(jobs)
+    ))
+
+def write_fan_out_summary(jobs, source_directory, text_entries, outcomes, summaries, wall_time, args):
+    """Write one summary covering every provider of a fan-out run."""
+    combined = {
+        "timestamp": datetime.now().isoformat(),
+        "source_directory": source_directory,
+        "total_files": len(text_entries),
+        "wall_time_seconds": round(wall_time, 3),
+        "providers": {
+            provider.name: {
+                "output_directory": output_directory,
+                "model": provider.model,
+                "wall_time_seconds": round(provider_time, 3),
+                **{key: summary[key] for key in ("completed", "updated", "skipped", "failed")},
+                "telemetry": summary["telemetry"]
+            }
+            for (provider, output_directory), (_, provider_time), summary in zip(jobs, outcomes, summaries)
+        }
+    }
+
+    explicit_output = args.output or os.getenv("OUTPUT_DIRECTORY")
+    if explicit_output is None:
+        timestamp = datetime.now().strftime("%m.%d.%y")
+        summary_path = Path(__file__).parent.parent.absolute() / f"Translations/fanout_summary_{timestamp}.json"
+    else:
+        summary_path = Path(explicit_output) / "fanout_summary.json"
+    with open(summary_path, 'w', encoding='utf-8') as summary_file:
+        json.dump(combined, summary_file, indent=2)
+    logger.info(f"Combined summary saved to {summary_path}")
+
+def main(default_provider=None):
+    """Main function to run the translator."""
+    args = build_parser(default_provider).parse_args()
+    provider_names = sorted(PROVIDERS) if "all" in args.provider else list(dict.fromkeys(args.provider))
+    fan_out = len(provider_names) > 1
+    configure_logging("fanout" if fan_out else provider_names[0])
+
+    if fan_out and args.api_key:
+        logger.error("--api-key can only be used with a single provider; set the provider environment variables instead")
+        return
+    if args.batch and args.incremental:
+        logger.error("--incremental cannot be combined with --batch")
+        return
+    if args.context_window and args.batch:
+        logger.error("--context-window cannot be combined with --batch")
+        return
+
+    source_directory = str(args.source or os.getenv("SOURCE_DIRECTORY") or (Path(__file__).parent.parent.absolute() / "Source_Text copy"))
+
+    # Each provider gets its own limiter and output directory
+    try:
+        glossary = load_glossary(args.glossary) if args.glossary else None
+        models = parse_models(args.model, provider_names)
+        jobs = []
+        for name in provider_names:
+            limiter = AdaptiveRateLimiter(
+                requests_per_minute=args.requests_per_minute,
+                tokens_per_minute=args.tokens_per_minute,
+                max_concurrency=args.workers,
+                target_latency=args.target_latency
+            )
+            provider = create_provider(name, model=models.get(name), api_key=args.api_key, limiter=limiter)
+            apply_glossary(provider, glossary)
+            jobs.append((provider, resolve_output_directory(args, name, fan_out)))
+    except (ValueError, OSError) as e:
+        logger.error(str(e))
+        return
+
+    # Load texts to process once, however many providers translate them
+    text_entries = load_texts_from_directory(source_directory)
+
+    if not text_entries:
+        logger.error(f"No text files found in {source_directory}")
+        return
+
+    # Filter specific files if requested
+    if args.files:
+        text_entries = [(filename, text) for filename, text in text_entries if filename in args.files]
+        if not text_entries:
+            logger.error("None of the specified files were found")
+            return
+
+    if args.retry_failed:
+        failed = set().union(*(failed_files(output_directory) for _, output_directory in jobs))
+        text_entries = [(filename, text) for filename, text in text_entries if filename in failed]
+        if not text_entries:
+            logger.info("No failed files to retry")
+            return
+
+    logger.info(f"Starting translation of {len(text_entries)} files")
+    logger.info(f"Source directory: {source_directory}")
+    for provider, output_directory in jobs:
+        # Create output directory if it doesn't exist
+        os.makedirs(output_directory, exist_ok=True)
+        logger.info(f"Provider: {provider.name}, model: {provider.model}, output directory: {output_directory}")
+        if args.batch and not provider.supports_batch:
+            logger.warning(f"{provider.name} has no batch API; translating interactively instead")
+    logger.info(f"Workers per provider: {args.workers}")
+
+    # Identical source text is never paid for twice, even across renamed files or output directories
+    cache = None
+    if not args.no_cache:
+        cache = TranslationCache(args.cache_path, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    # Chunks are measured in tokens unless a character size was asked for
+    chunk_size = args.chunk_size or 4000
+    chunk_tokens = None if args.chunk_size else args.chunk_tokens
+
+    # Process files concurrently with progress bars
+    start_time = time.monotonic()
+    outcomes = asyncio.run(
+        run_fan_out(
+            jobs, text_entries, args.force, cache, args.incremental, chunk_size, args.batch, args.poll_interval,
+            chunk_tokens, args.context_window
+        )
+    )
+    wall_time = time.monotonic() - start_time
+
+    summaries = [
+        write_summary(provider, source_directory, output_directory, text_entries, results, cache, provider_time)
+        for (provider, output_directory), (results, provider_time) in zip(jobs, outcomes)
+    ]
+    if fan_out:
+        write_fan_out_summary(jobs, source_directory, text_entries, outcomes, summaries, wall_time, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,556 @@
+import os
+import re
+import time
+import json
+import asyncio
+import logging
+from pathlib import Path
+from datetime import datetime
+from tqdm import tqdm
+from disk_cache import hash_key, normalize_text
+from text_chunker import chunk_text
+from chunk_context import context_for
+from glossary import check_glossary
+from providers import add_usage, empty_usage
+from telemetry import record_request, record_retry, file_telemetry, summarize_telemetry
+from job_journal import JobJournal, JOURNAL_FILE, IN_FLIGHT, DONE, FAILED
+
+logger = logging.getLogger(__name__)
+
+def natural_sort_key(s, _nsre=re.compile('([0-9]+)')):
+    """Sort strings with embedded numbers naturally."""
+    return [int(text) if text.isdigit() else text.lower() for text in re.split(_nsre, s)]
+
+def load_texts_from_directory(directory_path):
+    """Load all text files from the specified directory."""
+    directory = Path(directory_path)
+    text_entries = []
+
+    if not directory.exists():
+        logger.error(f"Directory not found: {directory_path}")
+        return text_entries
+
+    for filename in sorted(os.listdir(directory), key=natural_sort_key):
+        if filename.endswith(".txt"):
+            filepath = directory / filename
+            try:
+                with open(filepath, 'r', encoding='utf-8') as file:
+                    text_entries.append((filename, file.read()))
+                logger.debug(f"Loaded file: {filename}")
+            except Exception as e:
+                logger.error(f"Failed to load file {filename}: {str(e)}")
+
+    logger.info(f"Loaded {len(text_entries)} text files from {directory_path}")
+    return text_entries
+
+class TruncatedTranslationError(Exception):
+    """Raised when the model stops at its output limit before finishing a chunk."""
+
+async def _handle_api_error(provider, error, attempt, max_retries, retry_delay):
+    """Wait before the next attempt, or re-raise if the error is fatal or retries are used up."""
+    kind = provider.classify_error(error)
+    if kind is None:
+        logger.error(f"Unexpected error: {str(error)}")
+        raise error
+    if kind in ("rate_limited", "overloaded"):
+        # Pause every worker, not just this one, so the retries do not arrive in sync
+        wait_time = provider.limiter.record_rate_limited(
+            provider.error_headers(error), default_wait=retry_delay * (2 ** attempt)
+        )
+    if attempt >= max_retries - 1:
+        # Raise the last error itself, so errors/ and the journal record the real cause
+        logger.error(f"Failed after {max_retries} attempts: {str(error)}")
+        raise error
+    if kind == "rate_limited":
+        # The limiter holds this request back until the pause is over
+        logger.warning(f"Rate limit exceeded. Pausing {provider.name} requests for {wait_time:.1f} seconds.")
+        return
+    wait_time = retry_delay * (2 ** attempt)
+    logger.warning(f"API error: {str(error)}. Retrying in {wait_time} seconds.")
+    await asyncio.sleep(wait_time)
+
+def _check_truncated(response):
+    if response.truncated:
+        raise TruncatedTranslationError(
+            f"Translation stopped at the output limit after {len(response.text)} characters; use a smaller --chunk-tokens"
+        )
+
+async def translate_text_async(provider, text, max_retries=3, retry_delay=2, cache=None, usage=None):
+    """Translate text in one request, paced by the provider's shared limiter.
+
+    Token counts, the request latency and retries are added to the usage dict
+    when one is given.
+    """
+    if cache is not None:
+        cached = cache.get_translation(text, provider.model, provider.system_prompt, provider.user_prompt)
+        if cached is not None:
+            return cached
+
+    estimated_tokens = provider.count_tokens(provider.system_prompt + provider.user_content(text))
+
+    for attempt in range(max_retries):
+        try:
+            async with provider.limiter.slot(estimated_tokens):
+                start_time = time.monotonic()
+                response = await provider.complete(text)
+                latency = time.monotonic() - start_time
+                provider.limiter.record_success(latency, response.headers)
+            add_usage(usage, response.usage)
+            record_request(usage, latency)
+            _check_truncated(response)
+            if cache is not None:
+                cache.put_translation(text, provider.model, provider.system_prompt, provider.user_prompt, response.text)
+            return response.text
+        except TruncatedTranslationError:
+            raise
+        except Exception as e:
+            await _handle_api_error(provider, e, attempt, max_retries, retry_delay)
+            if attempt < max_retries - 1:
+                record_retry(usage)
+
+    raise Exception(f"Failed to translate after {max_retries} attempts")
+
+async def translate_text_streaming(provider, text, on_text, on_reset, max_retries=3, retry_delay=2, cache=None, usage=None):
+    """Translate text with the provider's streaming API, passing each text delta to on_text.
+
+    on_reset is called before a retry so the caller can discard partial output.
+    Token counts, the request latency, the time to the first token and retries
+    are added to the usage dict when one is given.
+    """
+    if cache is not None:
+        cached = cache.get_translation(text, provider.model, provider.system_prompt, provider.user_prompt)
+        if cached is not None:
+            on_text(cached)
+            return cached
+
+    estimated_tokens = provider.count_tokens(provider.system_prompt + provider.user_content(text))
+
+    for attempt in range(max_retries):
+        streamed = []
+        first_token = []
+
+        def forward(delta):
+            if not streamed:
+                first_token.append(time.monotonic() - start_time)
+            streamed.append(delta)
+            on_text(delta)
+
+        try:
+            async with provider.limiter.slot(estimated_tokens):
+                start_time = time.monotonic()
+                response = await provider.stream(text, forward)
+                latency = time.monotonic() - start_time
+                provider.limiter.record_success(latency, response.headers)
+            add_usage(usage, response.usage)
+            record_request(usage, latency, first_token[0] if first_token else None)
+            _check_truncated(response)
+            if cache is not None:
+                cache.put_translation(text, provider.model, provider.system_prompt, provider.user_prompt, response.text)
+            return response.text
+        except TruncatedTranslationError:
+            raise
+        except Exception as e:
+            if streamed:
+                on_reset()
+            await _handle_api_error(provider, e, attempt, max_retries, retry_delay)
+            if attempt < max_retries - 1:
+                record_retry(usage)
+
+    raise Exception(f"Failed to translate after {max_retries} attempts")
+
+# Joins the chunk translations in an output file
+CHUNK_SEPARATOR = '\n\n'
+
+class OrderedStreamWriter:
+    """Writes concurrently streamed chunk translations to a file in chunk order.
+
+    Text for the earliest unfinished chunk goes straight to the file as it
+    arrives; later chunks are buffered until every chunk before them is done.
+    """
+
+    def __init__(self, file, count, separator=CHUNK_SEPARATOR):
+        self.file = file
+        self.separator = separator
+        self.buffers = [[] for _ in range(count)]
+        self.finished = [False] * count
+        self.head = 0
+        self.head_offset = file.tell()
+
+    def write(self, index, text):
+        self.buffers[index].append(text)
+        if index == self.head:
+            self.file.write(text)
+            self.file.flush()
+
+    def reset(self, index):
+        """Discard the partial output of a chunk that is about to be retried."""
+        self.buffers[index] = []
+        if index == self.head:
+            self.file.seek(self.head_offset)
+            self.file.truncate()
+
+    def finish(self, index):
+        self.finished[index] = True
+        while self.head < len(self.finished) and self.finished[self.head]:
+            self.head += 1
+            if self.head < len(self.finished):
+                self.file.write(self.separator)
+                self.head_offset = self.file.tell()
+                self.file.write(''.join(self.buffers[self.head]))
+        self.file.flush()
+
+    def pieces(self):
+        return [''.join(buffer) for buffer in self.buffers]
+
+    def text(self):
+        return self.separator.join(self.pieces())
+
+async def translate_to_file(provider, text, output_filepath, cache=None, chunk_size=4000, usage=None, chunk_tokens=None, context_window=None, previous=None):
+    """Translate text in concurrent chunks, streaming the output to disk in order.
+
+    Chunks hold up to chunk_tokens tokens as counted by the provider, or
+    chunk_size characters when chunk_tokens is None. With a context_window, each
+    chunk is sent with the end of the source before it and of the translation of
+    the chunk context_window places earlier, which it waits for (see
+    chunk_context.context_for). Output goes to a .partial file that replaces
+    output_filepath once every chunk has finished.
+
+    previous maps chunk source hashes to translations from an earlier run (see
+    load_previous_chunks). The text is chunked around those chunks and their
+    translations are reused without a request. Returns the translation and its
+    chunk_record.
+    """
+    previous = previous or {}
+    known = (lambda chunk: chunk_hash(chunk) in previous) if previous else None
+    chunks = chunk_text(text, chunk_size, chunk_tokens, provider.count_tokens, known)
+    partial_path = output_filepath.with_name(output_filepath.name + '.partial')
+
+    try:
+        with open(partial_path, 'w', encoding='utf-8') as file:
+            writer = OrderedStreamWriter(file, len(chunks))
+
+            translations = {}
+            tasks = []
+
+            async def translate_chunk(index, chunk):
+                reused = previous.get(chunk_hash(chunk))
+                if reused is not None:
+                    translations[index] = reused
+                    writer.write(index, reused)
+                    writer.finish(index)
+                    return
+                if context_window:
+                    if index >= context_window:
+                        await tasks[index - context_window]
+                    chunk = context_for(chunks, index, context_window, translations)
+                translations[index] = await translate_text_streaming(
+                    provider, chunk,
+                    on_text=lambda delta: writer.write(index, delta),
+                    on_reset=lambda: writer.reset(index),
+                    cache=cache,
+                    usage=usage
+                )
+                writer.finish(index)
+
+            for i, chunk in enumerate(chunks):
+                tasks.append(asyncio.ensure_future(translate_chunk(i, chunk)))
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # Stop the sibling chunks before the file is closed underneath them
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            # The rename below must not publish data that is still only in memory
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+
+    os.replace(partial_path, output_filepath)
+    return writer.text(), chunk_record(chunks, writer.pieces())
+
+def chunk_hash(chunk):
+    return hash_key(normalize_text(chunk))[:16]
+
+def chunk_record(chunks, translations):
+    """Metadata that lets --incremental find the translation of each source chunk in the output file."""
+    return {
+        "chunks": len(chunks),
+        "source_chunks": [chunk_hash(chunk) for chunk in chunks],
+        # Lengths of the chunk translations, which the output joins with CHUNK_SEPARATOR
+        "chunk_lengths": [len(translation) for translation in translations]
+    }
+
+def load_previous_chunks(output_filepath):
+    """Return the .meta.json of a translation and its chunk translations keyed by source hash.
+
+    The chunks are cut out of the output file by the recorded lengths. There are
+    none when the metadata has no chunk record or the file no longer matches it,
+    e.g. after it was edited by hand.
+    """
+    metadata = {}
+    metadata_path = output_filepath.with_suffix('.meta.json')
+    if metadata_path.exists():
+        with open(metadata_path, 'r', encoding='utf-8') as meta_file:
+            metadata = json.load(meta_file)
+    with open(output_filepath, 'r', encoding='utf-8') as file:
+        translation = file.read()
+
+    hashes = metadata.get("source_chunks") or []
+    lengths = metadata.get("chunk_lengths") or []
+    if len(hashes) != len(lengths):
+        return metadata, {}
+    chunks = {}
+    offset = 0
+    for index, (source_hash, length) in enumerate(zip(hashes, lengths)):
+        if index > 0:
+            if not translation.startswith(CHUNK_SEPARATOR, offset):
+                return metadata, {}
+            offset += len(CHUNK_SEPARATOR)
+        chunks[source_hash] = translation[offset:offset + length]
+        offset += length
+    if offset != len(translation):
+        return metadata, {}
+    return metadata, chunks
+
+def write_atomic(path, content):
+    """Write content to path through a temporary file and a rename, so a crash leaves the old file or the new one."""
+    path = Path(path)
+    temporary_path = path.with_name(path.name + '.tmp')
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+def save_translation(output_filepath, filename, text, provider, translation, extra_metadata=None):
+    """Write a translation and its .meta.json next to it."""
+    write_atomic(output_filepath, translation)
+
+    save_metadata(output_filepath, filename, text, provider, translation, extra_metadata)
+
+def save_metadata(output_filepath, filename, text, provider, translation, extra_metadata=None):
+    """Write the .meta.json for a translation that is already on disk."""
+    metadata = {
+        "source_file": filename,
+        "translation_date": datetime.now().isoformat(),
+        "provider": provider.name,
+        "model": provider.model,
+        "characters": len(text),
+        "status": "completed",
+        # Recorded so that --incremental can tell whether the source changed since this run
+        "source_hash": hash_key(normalize_text(text))
+    }
+    if provider.glossary:
+        violations = check_glossary(provider.glossary, text, translation)
+        metadata["glossary_violations"] = violations
+        for violation in violations:
+            logger.warning(f"{filename}: {violation['term']} is not translated as {' / '.join(violation['renderings'])}")
+    if extra_metadata:
+        metadata.update(extra_metadata)
+
+    write_atomic(output_filepath.with_suffix('.meta.json'), json.dumps(metadata, indent=2))
+
+def save_error(output_directory, filename, error):
+    """Record a failed translation under the errors/ directory."""
+    error_dir = Path(output_directory) / "errors"
+    error_dir.mkdir(exist_ok=True)
+
+    error_info = {
+        "source_file": filename,
+        "error_date": datetime.now().isoformat(),
+        "error_message": str(error),
+        "status": "failed"
+    }
+
+    write_atomic(error_dir / f"{filename}.error.json", json.dumps(error_info, indent=2))
+
+def clear_error(output_directory, filename):
+    """Remove the error record of a file that has now been translated."""
+    (Path(output_directory) / "errors" / f"{filename}.error.json").unlink(missing_ok=True)
+
+def failed_files(output_directory):
+    """Return the files with an error record under errors/ or a failed state in the journal."""
+    error_dir = Path(output_directory) / "errors"
+    failed = {path.name[:-len(".error.json")] for path in error_dir.glob("*.error.json")} if error_dir.exists() else set()
+    journal_path = Path(output_directory) / JOURNAL_FILE
+    if journal_path.exists():
+        journal = JobJournal(output_directory)
+        try:
+            failed.update(journal.failed())
+        finally:
+            journal.close()
+    return failed
+
+def is_translated(journal, filename, output_filepath):
+    """Tell whether a file was finished by an earlier run, by the journal when there is one."""
+    if journal is None:
+        return output_filepath.exists()
+    return journal.is_done(filename, output_filepath)
+
+def record_state(journal, filename, state, text=None, error=None):
+    if journal is not None:
+        journal.mark(filename, state, text, error)
+
+async def process_file(provider, filename, text, output_directory, force_retranslate, cache=None, incremental=False, chunk_size=4000, chunk_tokens=None, context_window=None, journal=None):
+    """Process a single file for translation.
+
+    With a journal, a file counts as translated only once it is recorded as
+    done, so a file that an interrupted run left in flight is translated again.
+    With incremental, a file that was translated before is translated again
+    only if its source changed, and then only the chunks whose source changed
+    are sent.
+    """
+    output_filepath = Path(output_directory) / filename
+
+    previous = None
+    extra_metadata = {}
+    if incremental and is_translated(journal, filename, output_filepath) and not force_retranslate:
+        try:
+            metadata, previous = load_previous_chunks(output_filepath)
+        except Exception as e:
+            logger.warning(f"{filename}: could not read the previous translation ({str(e)}), translating it again")
+            metadata, previous = {}, {}
+        if previous and metadata.get("source_hash") == hash_key(normalize_text(text)):
+            logger.info(f"Skipping {filename} - source unchanged")
+            return filename, "skipped"
+        if not previous:
+            logger.info(f"{filename}: previous translation has no matching chunk record, translating it in full")
+        extra_metadata["incremental"] = {"previous_translation_date": metadata.get("translation_date")}
+
+    # Skip if translation exists and force_retranslate is False
+    elif is_translated(journal, filename, output_filepath) and not force_retranslate:
+        logger.info(f"Skipping {filename} - translation already exists")
+        return filename, "skipped"
+
+    try:
+        record_state(journal, filename, IN_FLIGHT, text)
+        logger.info(f"Translating {filename} with {provider.name}...")
+        start_time = time.monotonic()
+        usage = empty_usage()
+        translation, record = await translate_to_file(
+            provider, text, output_filepath, cache=cache, chunk_size=chunk_size, usage=usage, chunk_tokens=chunk_tokens,
+            context_window=context_window, previous=previous
+        )
+        if previous is not None:
+            reused = sum(source_hash in previous for source_hash in record["source_chunks"])
+            extra_metadata["incremental"].update(chunks_retranslated=record["chunks"] - reused, chunks_reused=reused)
+            logger.info(f"{filename}: re-translated {record['chunks'] - reused} of {record['chunks']} chunks")
+
+        save_metadata(
+            output_filepath, filename, text, provider, translation,
+            {**record, **extra_metadata, **file_telemetry(provider.model, usage, time.monotonic() - start_time)}
+        )
+
+        record_state(journal, filename, DONE)
+        clear_error(output_directory, filename)
+        if previous is not None:
+            logger.info(f"Translation updated in {output_filepath}")
+            return filename, "updated"
+        logger.info(f"Translation saved to {output_filepath}")
+        return filename, "completed"
+
+    except Exception as e:
+        logger.error(f"Failed to translate {filename}: {str(e)}")
+        save_error(output_directory, filename, e)
+        record_state(journal, filename, FAILED, error=str(e))
+        return filename, "failed"
+
+async def run_translations(provider, text_entries, output_directory, force_retranslate, cache=None, incremental=False, chunk_size=4000, position=0, chunk_tokens=None, context_window=None):
+    """Translate all entries concurrently on one event loop, paced by the provider's limiter.
+
+    Progress is recorded in the output directory's job journal, so running the
+    same command again after a crash resumes with the files that did not finish.
+    """
+    journal = JobJournal(output_directory)
+    tasks = [
+        asyncio.create_task(
+            process_file(
+                provider, filename, text, output_directory, force_retranslate, cache, incremental, chunk_size, chunk_tokens,
+                context_window, journal
+            )
+        )
+        for filename, text in text_entries
+    ]
+
+    progress = tqdm(
+        asyncio.as_completed(tasks), total=len(tasks), desc=f"Translating files ({provider.name})", position=position
+    )
+    try:
+        for task in progress:
+            await task
+    finally:
+        journal.close()
+
+    # Report results in source order rather than completion order
+    return [task.result() for task in tasks]
+
+def summarize_results(results):
+    """Count results by status."""
+    counts = {"completed": 0, "updated": 0, "skipped": 0, "failed": 0}
+    for _, status in results:
+        counts[status] += 1
+    return counts
+
+def load_run_metadata(output_directory, results):
+    """Read the .meta.json of every file that was translated or updated in this run."""
+    entries = []
+    for filename, status in results:
+        if status not in ("completed", "updated"):
+            continue
+        metadata_path = (Path(output_directory) / filename).with_suffix('.meta.json')
+        try:
+            with open(metadata_path, 'r', encoding='utf-8') as meta_file:
+                entries.append(json.load(meta_file))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read {metadata_path} for the summary: {str(e)}")
+    return entries
+
+def write_summary(provider, source_directory, output_directory, text_entries, results, cache=None, wall_time=None):
+    """Log the outcome of a run and save translation_summary.json.
+
+    The summary includes the tokens, requests, latency percentiles, throughput
+    and estimated cost of the files translated in this run.
+    """
+    counts = summarize_results(results)
+    telemetry = summarize_telemetry(load_run_metadata(output_directory, results), wall_time)
+
+    logger.info(f"Translation process completed ({provider.name}):")
+    logger.info(f"  - Completed: {counts['completed']}")
+    logger.info(f"  - Updated: {counts['updated']}")
+    logger.info(f"  - Skipped: {counts['skipped']}")
+    logger.info(f"  - Failed: {counts['failed']}")
+    if cache is not None:
+        cache_stats = cache.stats()
+        logger.info(f"  - Cache hits: {cache_stats['hits']}, misses: {cache_stats['misses']}")
+    if telemetry["requests"]:
+        latency = ""
+        if telemetry["latency_p50_seconds"] is not None:
+            latency = f", latency p50/p95: {telemetry['latency_p50_seconds']}/{telemetry['latency_p95_seconds']}s"
+        logger.info(f"  - Requests: {telemetry['requests']}, retries: {telemetry['retries']}{latency}")
+        cost = "unknown" if telemetry["cost_usd"] is None else f"${telemetry['cost_usd']:.4f}"
+        logger.info(
+            f"  - Tokens in/out: {telemetry['input_tokens']}/{telemetry['output_tokens']}, estimated cost: {cost}"
+        )
+
+    summary = {
+        "timestamp": datetime.now().isoformat(),
+        "source_directory": source_directory,
+        "output_directory": output_directory,
+        "provider": provider.name,
+        "model": provider.model,
+        "total_files": len(text_entries),
+        **counts,
+        "cache": cache.stats() if cache is not None else None,
+        "wall_time_seconds": round(wall_time, 3) if wall_time is not None else None,
+        "telemetry": telemetry,
+        "results": dict(results)
+    }
+
+    summary_path = Path(output_directory) / "translation_summary.json"
+    with open(summary_path, 'w', encoding='utf-8') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    return summary
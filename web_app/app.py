@@ -1,9 +1,11 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 import json
 import tempfile
 import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from werkzeug.utils import secure_filename
 import sys
 from pathlib import Path
@@ -13,10 +15,17 @@ import logging
 sys.path.append(str(Path(__file__).parent.parent / "translator_scripts copy"))
 
 # Import the translator functions
-from translator_claude import translate_text, initialize_anthropic
+from translator_claude import translate_text, translate_text_stream
+from providers import SYSTEM_PROMPT, empty_usage
+from disk_cache import TranslationCache, OCRCache
+from chunk_context import context_for
+from glossary import parse_glossary, glossary_prompt, check_glossary
 
 # Import OCR processor
 from ocr_processor import extract_text_from_pdf, extract_text_from_image, chunk_text
+from jobs import JobManager
+from client_pool import ClientPool
+import metrics
 
 # Configure logging
 logging.basicConfig(
@@ -40,9 +49,128 @@ ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg'}
 app.config['UPLOAD_FOLDER'] = str(UPLOAD_FOLDER)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
+# Input tokens per chunk, estimated from the script of the text
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "3000"))
+# Chunks of one document translated at the same time
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))
+# Chunk translations in flight across all requests, to stay under the API rate limit
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "8"))
+translation_slots = threading.BoundedSemaphore(TRANSLATION_CONCURRENCY)
+# Event streams open at once. Each holds a server thread until its job ends, so
+# keep this well below GUNICORN_THREADS to leave threads for other requests.
+EVENT_STREAMS = int(os.getenv("EVENT_STREAMS", "32"))
+event_stream_slots = threading.BoundedSemaphore(EVENT_STREAMS)
+
+# Translations are cached on disk and shared with the CLI translators
+translation_cache = TranslationCache()
+# OCR text is cached per page image, so re-uploading a scan skips Tesseract
+ocr_cache = OCRCache()
+# Anthropic clients are reused per API key so requests share keep-alive connections
+client_pool = ClientPool()
+# Long translations run in the background so requests return immediately
+job_manager = JobManager()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def save_upload(file):
+    """Save an uploaded file under UPLOAD_FOLDER and return (path, original filename)."""
+    # Generate a unique filename
+    filename = secure_filename(file.filename)
+    unique_filename = f"{uuid.uuid4()}_{filename}"
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+    file.save(filepath)
+    return filepath, filename
+
+def extract_text(filepath, filename):
+    """Return the text of an uploaded file, running OCR for PDFs and images."""
+    # Process the file based on its type
+    if filename.endswith('.pdf'):
+        logger.info(f"Processing PDF file: {filename}")
+        return extract_text_from_pdf(filepath, cache=ocr_cache)
+    elif filename.endswith(('.png', '.jpg', '.jpeg')):
+        logger.info(f"Processing image file: {filename}")
+        return extract_text_from_image(filepath, cache=ocr_cache)
+    else:
+        # Read text file
+        logger.info(f"Processing text file: {filename}")
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return f.read()
+
+def translate_chunks(client, chunks, model, on_chunk=None, on_delta=None, on_reset=None, context_window=0, system_prompt=SYSTEM_PROMPT):
+    """Translate chunks concurrently and return the translations in chunk order.
+
+    Up to CHUNK_CONCURRENCY chunks of the document are translated at once, and no
+    more than TRANSLATION_CONCURRENCY across the whole process. With a
+    context_window, each chunk waits for the chunk context_window places before
+    it and is sent with the end of that chunk's translation and of the preceding
+    source (see chunk_context.context_for). on_chunk(index, translation) is
+    called as each chunk finishes, which may be out of order.
+    When on_delta is given, chunks are streamed and on_delta(index, text) receives
+    each piece of text as it arrives; on_reset(index) is called before a retry.
+    The first chunk that fails cancels the chunks that have not started yet.
+    """
+    translations = [None] * len(chunks)
+    futures = []
+
+    def translate_one(i, chunk):
+        if context_window:
+            if i >= context_window:
+                # Submitted earlier, so it is already running or done and this cannot deadlock
+                futures[i - context_window].result()
+            chunk = context_for(chunks, i, context_window, translations)
+        usage = empty_usage()
+        try:
+            with translation_slots:
+                logger.info(f"Translating chunk {i+1}/{len(chunks)}")
+                if on_delta is not None:
+                    translations[i] = translate_text_stream(
+                        client, chunk,
+                        on_text=lambda text: on_delta(i, text),
+                        on_reset=lambda: on_reset(i) if on_reset is not None else None,
+                        model=model,
+                        cache=translation_cache,
+                        system_prompt=system_prompt,
+                        usage=usage
+                    )
+                else:
+                    translations[i] = translate_text(
+                        client, chunk, model=model, cache=translation_cache, system_prompt=system_prompt, usage=usage
+                    )
+        except Exception:
+            metrics.observe_chunk(model, usage, failed=True)
+            raise
+        metrics.observe_chunk(model, usage)
+        return translations[i]
+
+    if not chunks:
+        return translations
+    executor = ThreadPoolExecutor(max_workers=min(CHUNK_CONCURRENCY, len(chunks)), thread_name_prefix="chunk")
+    try:
+        for i, chunk in enumerate(chunks):
+            futures.append(executor.submit(translate_one, i, chunk))
+        indexes = {future: i for i, future in enumerate(futures)}
+        for future in as_completed(futures):
+            i = indexes[future]
+            future.result()
+            if on_chunk is not None:
+                on_chunk(i, translations[i])
+    finally:
+        # On failure, drop queued chunks instead of paying for translations nobody will see
+        executor.shutdown(wait=True, cancel_futures=True)
+    return translations
+
+def consistency_options(form):
+    """Read the optional context_window and glossary fields of a translation request.
+
+    Returns (context_window, glossary, system prompt); raises ValueError for bad input.
+    """
+    context_window = int(form.get('context_window') or 0)
+    if context_window < 0:
+        raise ValueError('context_window must not be negative')
+    glossary = parse_glossary(form.get('glossary', ''))
+    return context_window, glossary, SYSTEM_PROMPT + glossary_prompt(glossary)
+
 @app.route('/api/translate', methods=['POST'])
 def translate_api():
     """API endpoint to translate text"""
@@ -53,6 +181,11 @@ def translate_api():
     
     # Get the model to use
     model = request.form.get('model', 'claude-3-7-sonnet-latest')
+
+    try:
+        context_window, glossary, system_prompt = consistency_options(request.form)
+    except ValueError as e:
+        return jsonify({'error': f"Invalid glossary or context window: {str(e)}"}), 400
     
     # Check if text is provided directly
     text = request.form.get('text')
@@ -61,25 +194,10 @@ def translate_api():
     if 'file' in request.files:
         file = request.files['file']
         if file and allowed_file(file.filename):
-            # Generate a unique filename
-            filename = secure_filename(file.filename)
-            unique_filename = f"{uuid.uuid4()}_{filename}"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(filepath)
+            filepath, filename = save_upload(file)
             
             try:
-                # Process the file based on its type
-                if filename.endswith('.pdf'):
-                    logger.info(f"Processing PDF file: {filename}")
-                    text = extract_text_from_pdf(filepath)
-                elif filename.endswith(('.png', '.jpg', '.jpeg')):
-                    logger.info(f"Processing image file: {filename}")
-                    text = extract_text_from_image(filepath)
-                else:
-                    # Read text file
-                    logger.info(f"Processing text file: {filename}")
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        text = f.read()
+                text = extract_text(filepath, filename)
             except Exception as e:
                 logger.error(f"Error processing file {filename}: {str(e)}")
                 return jsonify({'error': f"Error processing file: {str(e)}"}), 500
@@ -91,19 +209,16 @@ def translate_api():
         return jsonify({'error': 'No text provided for translation'}), 400
     
     try:
-        # Initialize Anthropic client with the provided API key
-        client = initialize_anthropic(api_key)
-        
         # Chunk the text if it's too large
-        chunks = chunk_text(text)
+        chunks = chunk_text(text, max_tokens=CHUNK_TOKENS)
         logger.info(f"Text split into {len(chunks)} chunks")
         
-        # Translate each chunk
-        translations = []
-        for i, chunk in enumerate(chunks):
-            logger.info(f"Translating chunk {i+1}/{len(chunks)}")
-            translation = translate_text(client, chunk, model=model)
-            translations.append(translation)
+        # Translate the chunks concurrently with the pooled client for this API key;
+        # translations come back in chunk order
+        with client_pool.client(api_key) as client:
+            translations = translate_chunks(
+                client, chunks, model, context_window=context_window, system_prompt=system_prompt
+            )
         
         # Combine translations
         full_translation = '\n\n'.join(translations)
@@ -112,12 +227,141 @@ def translate_api():
             'original_text': text,
             'translated_text': full_translation,
             'model': model,
-            'chunks': len(chunks)
+            'chunks': len(chunks),
+            'glossary_violations': check_glossary(glossary, text, full_translation)
         })
     except Exception as e:
         logger.error(f"Translation error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Start a translation in the background and return its job id immediately"""
+    # Check if API key is provided
+    api_key = request.form.get('api_key')
+    if not api_key:
+        return jsonify({'error': 'API key is required'}), 400
+
+    model = request.form.get('model', 'claude-3-7-sonnet-latest')
+    text = request.form.get('text')
+
+    try:
+        context_window, glossary, system_prompt = consistency_options(request.form)
+    except ValueError as e:
+        return jsonify({'error': f"Invalid glossary or context window: {str(e)}"}), 400
+
+    # Uploads are saved now and processed by the job, since the request stream closes on return
+    upload = None
+    if 'file' in request.files:
+        file = request.files['file']
+        if file and allowed_file(file.filename):
+            upload = save_upload(file)
+
+    if not text and upload is None:
+        return jsonify({'error': 'No text provided for translation'}), 400
+
+    def run(job):
+        job_text = text
+        if upload is not None:
+            job_manager.update(job, status="extracting")
+            filepath, filename = upload
+            try:
+                job_text = extract_text(filepath, filename)
+            finally:
+                os.remove(filepath)
+        if not job_text:
+            raise ValueError('No text provided for translation')
+        job_manager.update(job, original_text=job_text)
+
+        chunks = chunk_text(job_text, max_tokens=CHUNK_TOKENS)
+        logger.info(f"Job {job.id}: text split into {len(chunks)} chunks")
+        job_manager.start_chunks(job, chunks)
+        with client_pool.client(api_key) as client:
+            translations = translate_chunks(
+                client, chunks, model,
+                on_chunk=lambda i, translation: job_manager.finish_chunk(job, i, translation),
+                on_delta=lambda i, delta: job_manager.chunk_delta(job, i, delta),
+                on_reset=lambda i: job_manager.reset_chunk(job, i),
+                context_window=context_window,
+                system_prompt=system_prompt
+            )
+        job_manager.update(job, glossary_violations=check_glossary(glossary, job_text, '\n\n'.join(translations)))
+
+    job = job_manager.submit(model, metrics.track_job(run))
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}',
+        'events_url': f'/api/jobs/{job.id}/events',
+        'result_url': f'/api/jobs/{job.id}/result'
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Report the status and per-chunk progress of a job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_manager.snapshot(job))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    """Stream a job's progress and translated text as Server-Sent Events"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    # Browsers send the last event id they saw when they reconnect
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    if not event_stream_slots.acquire(blocking=False):
+        # Every stream slot is taken; the frontend falls back to polling the job status
+        response = jsonify({'error': 'Too many open event streams, poll the job status instead'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    metrics.EVENT_STREAMS_OPEN.inc()
+
+    def stream():
+        # The heartbeat also finds disconnected clients: writing it to a closed
+        # connection fails, and the server then closes this generator
+        for item in job_manager.events(job, start):
+            if item is None:
+                yield ": keepalive\n\n"
+                continue
+            event_id, event, data = item
+            yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def release():
+        metrics.EVENT_STREAMS_OPEN.dec()
+        event_stream_slots.release()
+
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the server closes the response, whether the job finished or the client went away
+    response.call_on_close(release)
+    return response
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Return the translation of a completed job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == 'failed':
+        return jsonify({'error': job.error, 'status': job.status}), 409
+    if job.status != 'completed':
+        return jsonify({'error': 'Job is not finished yet', 'status': job.status}), 409
+    return jsonify(job.result())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose request, token, latency and cost metrics in the Prometheus text format"""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
 @app.route('/api/models', methods=['GET'])
 def get_models():
     """Return available models"""
@@ -0,0 +1,114 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import httpx
+from anthropic import DefaultHttpxClient
+# translator_claude and disk_cache come from "translator_scripts copy", which app.py puts on sys.path
+from translator_claude import initialize_anthropic
+from disk_cache import hash_key
+
+logger = logging.getLogger(__name__)
+
+# Clients kept per gunicorn worker; the least recently used one is closed beyond this
+CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "32"))
+# Clients unused for this many seconds are closed
+CLIENT_IDLE_SECONDS = int(os.getenv("CLIENT_IDLE_SECONDS", "300"))
+# HTTP connection limits of each client
+ANTHROPIC_MAX_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "16"))
+ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS", "8"))
+ANTHROPIC_KEEPALIVE_EXPIRY = float(os.getenv("ANTHROPIC_KEEPALIVE_EXPIRY", "60"))
+
+class _Entry:
+    def __init__(self, client):
+        self.client = client
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.evicted = False
+
+class ClientPool:
+    """Reuses one Anthropic client, and so its keep-alive connections, per API key.
+
+    Clients are looked up by a hash of the key, so the pool never stores a key
+    outside the client that needs it and never logs one. Clients that have been
+    idle for idle_seconds, or that fall off the end of the LRU order once more than
+    max_clients are cached, are closed as soon as no request is using them.
+    """
+
+    def __init__(self, max_clients=CLIENT_POOL_SIZE, idle_seconds=CLIENT_IDLE_SECONDS):
+        self.max_clients = max_clients
+        self.idle_seconds = idle_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _create(self, api_key):
+        http_client = DefaultHttpxClient(limits=httpx.Limits(
+            max_connections=ANTHROPIC_MAX_CONNECTIONS,
+            max_keepalive_connections=ANTHROPIC_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=ANTHROPIC_KEEPALIVE_EXPIRY
+        ))
+        return initialize_anthropic(api_key, http_client=http_client)
+
+    @contextmanager
+    def client(self, api_key):
+        """Yield the pooled client for api_key, creating it if needed."""
+        if not api_key:
+            raise ValueError("No API key provided")
+        key = hash_key(api_key)
+        with self.lock:
+            to_close = self._evict()
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = _Entry(self._create(api_key))
+                self.entries[key] = entry
+                to_close += self._evict()
+                logger.info(f"Created an Anthropic client; {len(self.entries)} pooled")
+            self.entries.move_to_end(key)
+            entry.in_use += 1
+        self._close(to_close)
+
+        try:
+            yield entry.client
+        finally:
+            with self.lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+                to_close = [entry] if entry.evicted and entry.in_use == 0 else []
+            self._close(to_close)
+
+    def _evict(self):
+        # Callers hold the lock; returns the evicted entries that can be closed now
+        cutoff = time.monotonic() - self.idle_seconds
+        evicted = [key for key, entry in self.entries.items() if entry.in_use == 0 and entry.last_used < cutoff]
+        overflow = len(self.entries) - len(evicted) - self.max_clients
+        for key in self.entries:
+            if overflow <= 0:
+                break
+            if key not in evicted:
+                evicted.append(key)
+                overflow -= 1
+
+        to_close = []
+        for key in evicted:
+            entry = self.entries.pop(key)
+            entry.evicted = True
+            if entry.in_use == 0:
+                to_close.append(entry)
+        return to_close
+
+    def _close(self, entries):
+        for entry in entries:
+            try:
+                entry.client.close()
+            except Exception as e:
+                logger.warning(f"Error closing an Anthropic client: {type(e).__name__}")
+
+    def close(self):
+        """Close every pooled client."""
+        with self.lock:
+            entries = list(self.entries.values())
+            self.entries.clear()
+        self._close(entries)
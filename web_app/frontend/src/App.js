@@ -4,10 +4,91 @@ import TranslationForm from './components/TranslationForm';
 import TranslationResult from './components/TranslationResult';
 import LoadingSpinner from './components/LoadingSpinner';
 
+const POLL_INTERVAL_MS = 2000;
+
+// Poll a job's status until it finishes, for when its event stream is unavailable
+const pollJob = async (job, onProgress) => {
+  for (;;) {
+    const response = await fetch(job.status_url);
+    const status = await response.json();
+    if (!response.ok) {
+      throw new Error(status.error || 'Translation failed');
+    }
+    if (status.status === 'failed') {
+      throw new Error(status.error || 'Translation failed');
+    }
+    if (status.status === 'completed') {
+      const result = await fetch(job.result_url);
+      return result.json();
+    }
+    onProgress({ status: status.status, chunks_total: status.chunks_total, chunks_completed: status.chunks_completed });
+    await new Promise((wait) => setTimeout(wait, POLL_INTERVAL_MS));
+  }
+};
+
+// Follow a job's event stream, calling onUpdate with the partial result as text arrives
+const followJob = (job, model, onUpdate, onProgress) => new Promise((resolve, reject) => {
+  const source = new EventSource(job.events_url);
+  let originalText = '';
+  let chunkTexts = [];
+  let chunksCompleted = 0;
+
+  const publish = () => onUpdate({
+    original_text: originalText,
+    translated_text: chunkTexts.filter(Boolean).join('\n\n'),
+    model,
+    chunks: chunkTexts.length,
+  });
+
+  source.addEventListener('source', (e) => {
+    originalText = JSON.parse(e.data).original_text;
+    publish();
+  });
+  source.addEventListener('status', (e) => {
+    const data = JSON.parse(e.data);
+    if (data.chunks_total > chunkTexts.length) {
+      chunkTexts = Array(data.chunks_total).fill('');
+    }
+    onProgress({ status: data.status, chunks_total: data.chunks_total, chunks_completed: chunksCompleted });
+  });
+  source.addEventListener('delta', (e) => {
+    const data = JSON.parse(e.data);
+    chunkTexts[data.index] += data.text;
+    publish();
+  });
+  source.addEventListener('reset', (e) => {
+    chunkTexts[JSON.parse(e.data).index] = '';
+    publish();
+  });
+  source.addEventListener('chunk', (e) => {
+    const data = JSON.parse(e.data);
+    chunkTexts[data.index] = data.translation;
+    chunksCompleted = data.chunks_completed;
+    onProgress({ status: 'translating', chunks_total: data.chunks_total, chunks_completed: chunksCompleted });
+    publish();
+  });
+  source.addEventListener('done', (e) => {
+    source.close();
+    resolve(JSON.parse(e.data));
+  });
+  source.addEventListener('failed', (e) => {
+    source.close();
+    reject(new Error(JSON.parse(e.data).error || 'Translation failed'));
+  });
+  source.onerror = () => {
+    // The browser reconnects on its own unless the stream was closed for good,
+    // e.g. when the server has no stream slot free; then poll the job instead
+    if (source.readyState === EventSource.CLOSED) {
+      pollJob(job, onProgress).then(resolve, reject);
+    }
+  };
+});
+
 function App() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [result, setResult] = useState(null);
+  const [progress, setProgress] = useState(null);
   const [models, setModels] = useState([]);
 
   useEffect(() => {
@@ -22,24 +103,30 @@ function App() {
     setLoading(true);
     setError(null);
     setResult(null);
+    setProgress(null);
 
     try {
-      const response = await fetch('/api/translate', {
+      // Start a background job, then follow its event stream until it finishes
+      const response = await fetch('/api/jobs', {
         method: 'POST',
         body: formData,
       });
 
-      const data = await response.json();
+      const job = await response.json();
 
       if (!response.ok) {
-        throw new Error(data.error || 'Translation failed');
+        throw new Error(job.error || 'Translation failed');
       }
 
+      // Render the translation as it streams in
+      const data = await followJob(job, formData.get('model'), setResult, setProgress);
+
       setResult(data);
     } catch (err) {
       setError(err.message);
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -53,7 +140,7 @@ function App() {
       <main className="App-main">
         <TranslationForm onSubmit={handleTranslate} models={models} />
 
-        {loading && <LoadingSpinner />}
+        {loading && <LoadingSpinner progress={progress} />}
         
         {error && (
           <div className="error-message">
@@ -62,7 +149,7 @@ function App() {
           </div>
         )}
 
-        {result && <TranslationResult result={result} />}
+        {result && <TranslationResult result={result} streaming={loading} />}
       </main>
 
       <footer className="App-footer">
@@ -1,11 +1,18 @@
 import React from 'react';
 import './LoadingSpinner.css';
 
-const LoadingSpinner = () => {
+const LoadingSpinner = ({ progress }) => {
+  let message = 'Translating... This may take a minute for longer texts.';
+  if (progress && progress.status === 'extracting') {
+    message = 'Extracting text from your file...';
+  } else if (progress && progress.chunks_total > 0) {
+    message = `Translating... ${progress.chunks_completed} of ${progress.chunks_total} chunks done.`;
+  }
+
   return (
     <div className="loading-container">
       <div className="loading-spinner"></div>
-      <p className="loading-text">Translating... This may take a minute for longer texts.</p>
+      <p className="loading-text">{message}</p>
     </div>
   );
 };
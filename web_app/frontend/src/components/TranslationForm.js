@@ -7,6 +7,8 @@ const TranslationForm = ({ onSubmit, models }) => {
   const [file, setFile] = useState(null);
   const [model, setModel] = useState('claude-3-7-sonnet-latest');
   const [inputMethod, setInputMethod] = useState('text');
+  const [glossary, setGlossary] = useState('');
+  const [carryContext, setCarryContext] = useState(false);
 
   const handleSubmit = (e) => {
     e.preventDefault();
@@ -30,6 +32,14 @@ const TranslationForm = ({ onSubmit, models }) => {
     formData.append('api_key', apiKey);
     formData.append('model', model);
 
+    if (glossary.trim()) {
+      formData.append('glossary', glossary);
+    }
+    if (carryContext) {
+      // Each chunk waits for the one two places before it, so two chunks translate at a time
+      formData.append('context_window', '2');
+    }
+
     if (inputMethod === 'text') {
       formData.append('text', text);
     } else {
@@ -130,6 +140,34 @@ const TranslationForm = ({ onSubmit, models }) => {
           </div>
         )}
 
+        <div className="form-group">
+          <label htmlFor="glossary">Glossary</label>
+          <textarea
+            id="glossary"
+            value={glossary}
+            onChange={(e) => setGlossary(e.target.value)}
+            placeholder={'Optional, one term per line, e.g.\nΣωκράτης = Socrates\nλόγος = reason | argument'}
+            rows="4"
+          />
+          <small>
+            Terms are translated as given, and the result lists any term that was not.
+          </small>
+        </div>
+
+        <div className="form-group">
+          <label className="checkbox-label">
+            <input
+              type="checkbox"
+              checked={carryContext}
+              onChange={(e) => setCarryContext(e.target.checked)}
+            />
+            Carry context between chunks
+          </label>
+          <small>
+            Keeps names and pronouns consistent in long texts, at the cost of translating fewer chunks at once.
+          </small>
+        </div>
+
         <button type="submit" className="submit-button">
           Translate
         </button>
@@ -1,8 +1,8 @@
 import React from 'react';
 import './TranslationResult.css';
 
-const TranslationResult = ({ result }) => {
-  const { original_text, translated_text, model, chunks } = result;
+const TranslationResult = ({ result, streaming = false }) => {
+  const { original_text, translated_text, model, chunks, glossary_violations = [] } = result;
 
   const handleCopyTranslation = () => {
     navigator.clipboard.writeText(translated_text);
@@ -21,7 +21,7 @@ const TranslationResult = ({ result }) => {
 
   return (
     <div className="translation-result">
-      <h2>Translation Result</h2>
+      <h2>Translation Result{streaming && <span className="streaming-indicator"> (translating...)</span>}</h2>
       
       <div className="result-info">
         <p>
@@ -39,6 +39,19 @@ const TranslationResult = ({ result }) => {
         </div>
       </div>
 
+      {glossary_violations.length > 0 && (
+        <div className="glossary-violations">
+          <strong>Glossary terms not translated as given:</strong>
+          <ul>
+            {glossary_violations.map((violation) => (
+              <li key={violation.term}>
+                {violation.term} (expected {violation.renderings.join(' or ')})
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
+
       <div className="text-columns">
         <div className="text-column">
           <h3>Original Text</h3>
@@ -0,0 +1,9 @@
+import os
+
+# Jobs are kept in memory, so serve with one process and many threads. Each open
+# event stream holds a thread until its job finishes, so there are far more
+# threads than streams (see EVENT_STREAMS in app.py).
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = 1
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
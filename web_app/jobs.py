@@ -0,0 +1,176 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# Seconds without events after which an event stream sends a heartbeat
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+
+class Job:
+    """The state of one background translation, as reported to clients.
+
+    Credentials are never stored on a job; they only live in the closure of the
+    task that runs it.
+    """
+
+    def __init__(self, model):
+        self.id = uuid.uuid4().hex
+        self.model = model
+        self.status = "queued"
+        self.error = None
+        self.original_text = None
+        self.chunks = []
+        self.translations = []
+        self.glossary_violations = []
+        # (event, data) pairs in the order they happened, replayed to every event stream subscriber
+        self.events = []
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def finished(self):
+        return self.status in ("completed", "failed")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "model": self.model,
+            "chunks_total": len(self.chunks),
+            "chunks_completed": sum(1 for status in self.chunks if status == "completed"),
+            "chunks": self.chunks,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+    def result(self):
+        return {
+            "original_text": self.original_text,
+            "translated_text": '\n\n'.join(self.translations),
+            "model": self.model,
+            "chunks": len(self.chunks),
+            "glossary_violations": self.glossary_violations
+        }
+
+class JobManager:
+    """Runs translation jobs on a thread pool and keeps their progress in memory.
+
+    Every change to a job is also recorded as an event, which event streams
+    replay and then follow live. Jobs live in the memory of one process, so the
+    app must be served by a single process (use threads to serve requests
+    concurrently).
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, retention_seconds=JOB_RETENTION_SECONDS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.retention_seconds = retention_seconds
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def submit(self, model, work):
+        """Queue work(job) on the executor and return the new job immediately."""
+        job = Job(model)
+        with self.lock:
+            self._prune()
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _publish(self, job, event, data):
+        # Callers hold the lock
+        job.events.append((event, data))
+        job.updated_at = time.time()
+        self.changed.notify_all()
+
+    def update(self, job, **changes):
+        """Change job fields under the lock so readers never see a half-updated job."""
+        with self.lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+            if "original_text" in changes:
+                self._publish(job, "source", {"original_text": job.original_text})
+            if "status" in changes:
+                self._publish(job, "status", {"status": job.status, "chunks_total": len(job.chunks)})
+                if job.status == "completed":
+                    self._publish(job, "done", job.result())
+                elif job.status == "failed":
+                    # Not "error", which EventSource reserves for connection errors
+                    self._publish(job, "failed", {"error": job.error})
+
+    def start_chunks(self, job, chunks):
+        self.update(job, status="translating", chunks=["pending"] * len(chunks), translations=[None] * len(chunks))
+
+    def chunk_delta(self, job, index, text):
+        with self.lock:
+            job.chunks[index] = "translating"
+            self._publish(job, "delta", {"index": index, "text": text})
+
+    def reset_chunk(self, job, index):
+        """Tell subscribers to discard the partial text of a chunk that is being retried."""
+        with self.lock:
+            self._publish(job, "reset", {"index": index})
+
+    def finish_chunk(self, job, index, translation):
+        with self.lock:
+            job.chunks[index] = "completed"
+            job.translations[index] = translation
+            self._publish(job, "chunk", {
+                "index": index,
+                "translation": translation,
+                "chunks_completed": sum(1 for status in job.chunks if status == "completed"),
+                "chunks_total": len(job.chunks)
+            })
+
+    def snapshot(self, job):
+        with self.lock:
+            return job.to_dict()
+
+    def events(self, job, start=0, keepalive_seconds=EVENT_KEEPALIVE_SECONDS):
+        """Yield (event id, event, data) for every event from start on, until the job finishes.
+
+        Yields None when nothing happened for keepalive_seconds so the caller can
+        keep the connection open.
+        """
+        position = start
+        while True:
+            with self.changed:
+                if position >= len(job.events) and not job.finished:
+                    self.changed.wait(timeout=keepalive_seconds)
+                new_events = job.events[position:]
+                finished = job.finished
+            if not new_events:
+                if finished:
+                    return
+                yield None
+                continue
+            for event, data in new_events:
+                yield position, event, data
+                position += 1
+
+    def _run(self, job, work):
+        try:
+            work(job)
+            self.update(job, status="completed")
+            logger.info(f"Job {job.id} completed")
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            self.update(job, status="failed", error=str(e))
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and job.updated_at < cutoff]:
+            del self.jobs[job_id]
@@ -0,0 +1,71 @@
+from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+# telemetry and providers come from "translator_scripts copy", which app.py puts on sys.path
+from telemetry import PRICES, cost_of
+from providers import USAGE_FIELDS
+
+# Buckets from a fast cache-warm chunk up to a long chunk on a busy model
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+CHUNKS = Counter(
+    "translator_chunks_total", "Chunks translated, by where the translation came from", ["model", "source"]
+)
+CHUNK_FAILURES = Counter("translator_chunk_failures_total", "Chunks that failed after all retries", ["model"])
+REQUESTS = Counter("translator_api_requests_total", "Successful Anthropic API requests", ["model"])
+RETRIES = Counter("translator_api_retries_total", "Failed API attempts that were retried", ["model"])
+TOKENS = Counter("translator_tokens_total", "Tokens processed by the API", ["model", "kind"])
+COST = Counter("translator_cost_usd_total", "Estimated API cost in US dollars", ["model"])
+REQUEST_SECONDS = Histogram(
+    "translator_api_request_seconds", "Duration of one API request", ["model"], buckets=LATENCY_BUCKETS
+)
+FIRST_TOKEN_SECONDS = Histogram(
+    "translator_api_first_token_seconds", "Time to the first streamed token", ["model"], buckets=LATENCY_BUCKETS
+)
+JOBS = Counter("translator_jobs_total", "Finished background jobs, by outcome", ["status"])
+JOBS_IN_PROGRESS = Gauge("translator_jobs_in_progress", "Background jobs queued or running")
+EVENT_STREAMS_OPEN = Gauge("translator_event_streams_open", "Job event streams currently open")
+
+def model_label(model):
+    """Label series by model family, so arbitrary model names sent by clients cannot multiply them."""
+    families = [prefix for prefix in PRICES if model and model.startswith(prefix)]
+    return max(families, key=len) if families else "other"
+
+def observe_chunk(model, usage, failed=False):
+    """Record the usage accumulator of one chunk (see telemetry.record_request)."""
+    cost = cost_of(model, usage)
+    model = model_label(model)
+    requests = usage.get("requests", 0)
+    if failed:
+        CHUNK_FAILURES.labels(model).inc()
+    else:
+        CHUNKS.labels(model, "api" if requests else "cache").inc()
+    REQUESTS.labels(model).inc(requests)
+    RETRIES.labels(model).inc(usage.get("retries", 0))
+    for field in USAGE_FIELDS:
+        TOKENS.labels(model, field.replace("_tokens", "")).inc(usage.get(field, 0))
+    if cost:
+        COST.labels(model).inc(cost)
+    for seconds in usage.get("latency_seconds", []):
+        REQUEST_SECONDS.labels(model).observe(seconds)
+    for seconds in usage.get("first_token_seconds", []):
+        FIRST_TOKEN_SECONDS.labels(model).observe(seconds)
+
+def track_job(work):
+    """Wrap a JobManager work function to count jobs in progress and their outcomes."""
+    JOBS_IN_PROGRESS.inc()
+
+    def run(job):
+        try:
+            work(job)
+        except Exception:
+            JOBS.labels("failed").inc()
+            raise
+        else:
+            JOBS.labels("completed").inc()
+        finally:
+            JOBS_IN_PROGRESS.dec()
+
+    return run
+
+def render():
+    """Return the metrics page body and content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
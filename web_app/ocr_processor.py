@@ -1,9 +1,21 @@
+import io
 import os
+import sys
+import shlex
+import logging
+import functools
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
-import tempfile
-import logging
+from pathlib import Path
+
+# The chunker is shared with the command-line translators
+sys.path.append(str(Path(__file__).parent.parent / "translator_scripts copy"))
+from text_chunker import chunk_text
 
 # Configure logging
 logging.basicConfig(
@@ -12,66 +24,124 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def extract_text_from_image(image_path):
+OCR_LANGUAGE = 'grc'
+# Extra Tesseract options, e.g. "--psm 6"; part of the OCR cache key
+OCR_CONFIG = os.getenv("OCR_TESSERACT_CONFIG", "")
+# One Tesseract process per core; each PDF holds at most two batches of page images in memory
+OCR_WORKERS = int(os.getenv("OCR_WORKERS") or os.cpu_count() or 1)
+OCR_PAGE_BATCH_SIZE = int(os.getenv("OCR_PAGE_BATCH_SIZE") or OCR_WORKERS)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _init_worker():
+    # Tesseract's own OpenMP threads would oversubscribe the cores the pool already uses
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+def _get_pool():
+    """Return the process pool shared by all OCR requests, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the web server is multithreaded
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return _pool
+
+@functools.lru_cache(maxsize=None)
+def tesseract_version():
+    return str(pytesseract.get_tesseract_version())
+
+def ocr_page(image, lang=OCR_LANGUAGE, config=OCR_CONFIG):
+    """OCR one in-memory page image, piping it to tesseract as PGM/PPM instead of writing a PNG."""
+    if image.mode not in ('1', 'L', 'RGB'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PPM')
+    result = subprocess.run(
+        [pytesseract.pytesseract.tesseract_cmd, 'stdin', 'stdout', '-l', lang, *shlex.split(config)],
+        input=buffer.getvalue(),
+        capture_output=True
+    )
+    if result.returncode != 0:
+        raise pytesseract.TesseractError(result.returncode, result.stderr.decode('utf-8', errors='replace'))
+    return result.stdout.decode('utf-8')
+
+def ocr_cache_key(cache, image):
+    return cache.key_for(image, OCR_LANGUAGE, OCR_CONFIG, tesseract_version())
+
+def _submit_page(pool, image, cache):
+    """Return (cache key, future) for one page; pages found in the cache get a finished future and no key."""
+    if cache is not None:
+        key = ocr_cache_key(cache, image)
+        text = cache.get(key)
+        if text is not None:
+            future = Future()
+            future.set_result(text)
+            return None, future
+        return key, pool.submit(ocr_page, image)
+    return None, pool.submit(ocr_page, image)
+
+def _collect_page(key, future, cache):
+    text = future.result()
+    if key is not None:
+        cache.put(key, text)
+    return text
+
+def extract_text_from_image(image_path, cache=None):
     """Extract text from an image using Tesseract OCR."""
     try:
         # Open the image
         image = Image.open(image_path)
-        
-        # Use pytesseract to extract text
-        text = pytesseract.image_to_string(image, lang='grc')
-        
+
+        key = None
+        if cache is not None:
+            key = ocr_cache_key(cache, image)
+            text = cache.get(key)
+            if text is not None:
+                return text
+
+        text = ocr_page(image)
+        if key is not None:
+            cache.put(key, text)
+
         return text
     except Exception as e:
         logger.error(f"Error extracting text from image: {str(e)}")
         raise
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a PDF file using Tesseract OCR."""
+def extract_text_from_pdf(pdf_path, batch_size=OCR_PAGE_BATCH_SIZE, cache=None):
+    """Extract text from a PDF file using Tesseract OCR.
+
+    Pages are rasterized batch_size at a time and handed to the OCR process pool
+    as in-memory images. The next batch is rasterized while the pool works on the
+    current one, so memory stays bounded however long the PDF is. The text is
+    joined in page order. Pages found in the OCR cache are not OCR'd again.
+    """
     try:
-        # Create a temporary directory for the images
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Convert PDF to images
-            images = convert_from_path(pdf_path)
-            
-            # Extract text from each image
-            extracted_text = []
-            for i, image in enumerate(images):
-                # Save the image temporarily
-                temp_image_path = os.path.join(temp_dir, f'page_{i}.png')
-                image.save(temp_image_path, 'PNG')
-                
-                # Extract text from the image
-                page_text = extract_text_from_image(temp_image_path)
-                extracted_text.append(page_text)
-            
-            # Combine all extracted text
-            return '\n\n'.join(extracted_text)
+        page_count = pdfinfo_from_path(pdf_path)["Pages"]
+        pool = _get_pool()
+        extracted_text = []
+        previous_batch = []
+
+        for first_page in range(1, page_count + 1, batch_size):
+            last_page = min(first_page + batch_size - 1, page_count)
+            # Grayscale pages are a third of the size to send to the workers; Tesseract binarizes anyway
+            images = convert_from_path(pdf_path, first_page=first_page, last_page=last_page, grayscale=True)
+            current_batch = [_submit_page(pool, image, cache) for image in images]
+            del images
+
+            extracted_text.extend(_collect_page(key, future, cache) for key, future in previous_batch)
+            previous_batch = current_batch
+            logger.debug(f"Rasterized pages {first_page}-{last_page} of {page_count}")
+
+        extracted_text.extend(_collect_page(key, future, cache) for key, future in previous_batch)
+
+        # Combine all extracted text
+        return '\n\n'.join(extracted_text)
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {str(e)}")
         raise
-
-def chunk_text(text, max_chunk_size=4000):
-    """Split text into chunks of appropriate size for the API."""
-    # Simple chunking by paragraphs
-    paragraphs = text.split('\n\n')
-    chunks = []
-    current_chunk = ""
-    
-    for paragraph in paragraphs:
-        # If adding this paragraph would exceed the max chunk size,
-        # save the current chunk and start a new one
-        if len(current_chunk) + len(paragraph) > max_chunk_size and current_chunk:
-            chunks.append(current_chunk)
-            current_chunk = paragraph
-        else:
-            if current_chunk:
-                current_chunk += '\n\n' + paragraph
-            else:
-                current_chunk = paragraph
-    
-    # Add the last chunk if it's not empty
-    if current_chunk:
-        chunks.append(current_chunk)
-    
-    return chunks 
\ No newline at end of file